@@ -867,15 +867,20 @@ IOFunction PoplarExecutor::CreateInfeedIOThreadFunction(
         auto& tensor = outputs[j];
         std::vector<tensorflow::Tensor> tensor_slices;
         if (current_replication_factor_ > 1) {
-          // For replicated graphs, slice the input tensor and enqueue
-          // it separately for each replica.
-          CHECK_EQ(tensor.dim_size(0), current_replication_factor_);
+          // For replicated graphs, split dimension 0 of the input tensor
+          // into one contiguous block per replica and enqueue each block
+          // separately.
+          const int64 dim0 = tensor.dim_size(0);
+          CHECK_EQ(dim0 % current_replication_factor_, 0);
+          const int64 rows_per_replica = dim0 / current_replication_factor_;
           tensor_slices.reserve(current_replication_factor_);
           for (auto replica_id = 0; replica_id < current_replication_factor_;
                ++replica_id) {
             // Note that the tensor_slice shares the data buffer with the
             // tensor which works with ref counting.
-            tensor_slices.push_back(tensor.SubSlice(replica_id));
+            const int64 start = replica_id * rows_per_replica;
+            tensor_slices.push_back(
+                tensor.Slice(start, start + rows_per_replica));
           }
         } else {
           tensor_slices = {tensor};
@@ -2615,7 +2620,7 @@ void PoplarExecutor::CreateInfeedIterator(
     const PoplarFeedConfig& config, const std::vector<xla::Shape>& shapes,
     const tensorflow::data::IteratorContext::Params& params,
     tensorflow::FunctionLibraryRuntime* flr,
-    tensorflow::data::DatasetBase* dataset) {
+    tensorflow::data::DatasetBase* dataset, bool use_pinned_host_memory) {
   auto& feed_id = config.feed_id();
   if (infeed_iterators_.contains(feed_id)) {
     LOG(FATAL) << "Infeed with id='" << feed_id
@@ -2624,8 +2629,8 @@ void PoplarExecutor::CreateInfeedIterator(
                   "the same TensorFlow device to have unique names.";
   } else {
     infeed_iterators_[feed_id] = absl::make_unique<InfeedIterator>(
-        flr, params, dataset, GetInfeedAllocator(), config.replication_factor(),
-        shapes, feed_id);
+        flr, params, dataset, GetInfeedAllocator(use_pinned_host_memory),
+        config.replication_factor(), shapes, feed_id);
   }
 }
 
@@ -2648,8 +2653,17 @@ Status PoplarExecutor::DeleteInfeedIterator(const std::string& feed_id) {
   return Status::OK();
 }
 
-InfeedAllocator* PoplarExecutor::GetInfeedAllocator() {
-  return &infeed_allocator;
+Status PoplarExecutor::WarmUpInfeedIterator(const std::string& feed_id) {
+  auto itr = infeed_iterators_.find(feed_id);
+  if (itr == infeed_iterators_.end()) {
+    return xla::NotFound("Infeed with id='%s' has not been created.",
+                         feed_id.c_str());
+  }
+  return itr->second->WarmUp();
+}
+
+InfeedAllocator* PoplarExecutor::GetInfeedAllocator(bool use_pinned_memory) {
+  return use_pinned_memory ? &pinned_infeed_allocator : &infeed_allocator;
 }
 
 std::vector<std::vector<tensorflow::Tensor>>
@@ -518,11 +518,16 @@ class PoplarExecutor : public se::internal::StreamExecutorInterface {
       const PoplarFeedConfig& config, const std::vector<xla::Shape>& shapes,
       const tensorflow::data::IteratorContext::Params& params,
       tensorflow::FunctionLibraryRuntime* flr,
-      tensorflow::data::DatasetBase* dataset);
+      tensorflow::data::DatasetBase* dataset,
+      bool use_pinned_host_memory = false);
 
   Status DeleteInfeedIterator(const std::string& feed_id);
 
-  InfeedAllocator* GetInfeedAllocator();
+  // Fetch the first element of the infeed dataset so that the dataset pipeline
+  // starts preparing data before the infeed is first used.
+  Status WarmUpInfeedIterator(const std::string& feed_id);
+
+  InfeedAllocator* GetInfeedAllocator(bool use_pinned_memory = false);
 
   // Lock the outfeed queue and dequeue all the tensors from a given feed.
   // Fails if the outfeed with the given name does not exist.
@@ -903,6 +908,9 @@ class PoplarExecutor : public se::internal::StreamExecutorInterface {
   // Allocator that should be used for infeeds.
   InfeedAllocator infeed_allocator;
 
+  // Allocator for infeeds which requested page-locked host buffers.
+  InfeedAllocator pinned_infeed_allocator{/*use_pinned_memory=*/true};
+
   absl::flat_hash_map<std::string, std::unique_ptr<InfeedIterator>>
       infeed_iterators_;
 
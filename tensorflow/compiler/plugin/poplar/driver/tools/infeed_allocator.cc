@@ -15,19 +15,105 @@ limitations under the License.
 
 #include "tensorflow/compiler/plugin/poplar/driver/tools/infeed_allocator.h"
 
+#include <sys/mman.h>
+#include <unistd.h>
+
+#include "tensorflow/core/platform/logging.h"
 #include "tensorflow/core/platform/mem.h"
 
 namespace xla {
 namespace poplarplugin {
-std::string InfeedAllocator::Name() { return "infeed-allocator"; }
+namespace {
+size_t PageSize() {
+  static const size_t page_size = sysconf(_SC_PAGESIZE);
+  return page_size;
+}
+}  // namespace
+
+InfeedAllocator::InfeedAllocator(bool use_pinned_memory)
+    : use_pinned_memory_(use_pinned_memory) {}
+
+InfeedAllocator::~InfeedAllocator() {
+  tensorflow::mutex_lock lk(mu_);
+  for (auto& sized_blocks : free_pinned_blocks_) {
+    for (void* ptr : sized_blocks.second) {
+      munlock(ptr, sized_blocks.first);
+      tensorflow::port::AlignedFree(ptr);
+    }
+  }
+}
+
+std::string InfeedAllocator::Name() {
+  return use_pinned_memory_ ? "pinned-infeed-allocator" : "infeed-allocator";
+}
 
 void* InfeedAllocator::AllocateRaw(size_t alignment, size_t num_bytes) {
+  if (use_pinned_memory_ && num_bytes >= kMinPinnedBlockBytes &&
+      !pinning_failed_.load(std::memory_order_relaxed)) {
+    return AllocatePinned(alignment, num_bytes);
+  }
   const size_t min_alignment = 64;
   alignment = alignment < min_alignment ? min_alignment : alignment;
   return tensorflow::port::AlignedMalloc(num_bytes, min_alignment);
 }
 
+void* InfeedAllocator::AllocatePinned(size_t alignment, size_t num_bytes) {
+  // mlock works on whole pages, so give every block its own pages. Otherwise
+  // unlocking one block would also unlock its neighbours.
+  const size_t page_size = PageSize();
+  alignment = alignment < page_size ? page_size : alignment;
+  const size_t size = (num_bytes + page_size - 1) / page_size * page_size;
+  {
+    tensorflow::mutex_lock lk(mu_);
+    auto itr = free_pinned_blocks_.find(size);
+    if (itr != free_pinned_blocks_.end() && !itr->second.empty()) {
+      void* ptr = itr->second.back();
+      itr->second.pop_back();
+      free_pinned_bytes_ -= size;
+      pinned_blocks_[ptr] = size;
+      return ptr;
+    }
+  }
+
+  void* ptr = tensorflow::port::AlignedMalloc(size, alignment);
+  if (ptr == nullptr) {
+    return nullptr;
+  }
+  if (mlock(ptr, size) != 0) {
+    // Stop trying, every further attempt would most likely fail too.
+    if (!pinning_failed_.exchange(true)) {
+      LOG(WARNING) << "Could not page-lock an infeed buffer of " << size
+                   << " bytes, using pageable memory from now on.";
+    }
+    return ptr;
+  }
+  tensorflow::mutex_lock lk(mu_);
+  pinned_blocks_[ptr] = size;
+  return ptr;
+}
+
 void InfeedAllocator::DeallocateRaw(void* ptr) {
+  if (use_pinned_memory_) {
+    size_t size = 0;
+    {
+      tensorflow::mutex_lock lk(mu_);
+      auto itr = pinned_blocks_.find(ptr);
+      if (itr != pinned_blocks_.end()) {
+        size = itr->second;
+        pinned_blocks_.erase(itr);
+        // Keep the block locked, the infeed allocates buffers of the same few
+        // sizes over and over again.
+        if (free_pinned_bytes_ + size <= kMaxFreePinnedBytes) {
+          free_pinned_blocks_[size].push_back(ptr);
+          free_pinned_bytes_ += size;
+          return;
+        }
+      }
+    }
+    if (size != 0) {
+      munlock(ptr, size);
+    }
+  }
   tensorflow::port::AlignedFree(ptr);
 }
 
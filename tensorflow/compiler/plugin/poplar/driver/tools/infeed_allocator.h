@@ -16,14 +16,32 @@ limitations under the License.
 #ifndef TENSORFLOW_COMPILER_PLUGIN_POPLAR_DRIVER_TOOLS_INFEED_ALLOCATOR_H_
 #define TENSORFLOW_COMPILER_PLUGIN_POPLAR_DRIVER_TOOLS_INFEED_ALLOCATOR_H_
 
+#include <atomic>
 #include <string>
+#include <vector>
+
+#include "absl/container/flat_hash_map.h"
 
 #include "tensorflow/core/framework/allocator.h"
+#include "tensorflow/core/platform/mutex.h"
 
 namespace xla {
 namespace poplarplugin {
 class InfeedAllocator : public tensorflow::Allocator {
  public:
+  // When `use_pinned_memory` is set, the allocator asks the operating system
+  // to page-lock the blocks of at least kMinPinnedBlockBytes it returns, such
+  // as batched infeed buffers, which can make page faults less likely while
+  // they are copied to the device. Smaller blocks are always pageable. Pinned
+  // blocks are page aligned and rounded up to whole pages so that no two
+  // blocks share a page. Up to kMaxFreePinnedBytes of freed blocks are kept
+  // locked for reuse by later allocations of the same size. Once a block
+  // cannot be locked (for example because RLIMIT_MEMLOCK has been reached)
+  // every later block is pageable.
+  explicit InfeedAllocator(bool use_pinned_memory = false);
+
+  ~InfeedAllocator() override;
+
   // Returns a string identifying this allocator
   std::string Name() override;
 
@@ -36,6 +54,27 @@ class InfeedAllocator : public tensorflow::Allocator {
   // Deallocate a block of memory pointer to by "ptr"
   // REQUIRES: "ptr" was previously returned by a call to AllocateRaw
   void DeallocateRaw(void* ptr) override;
+
+ private:
+  const bool use_pinned_memory_;
+
+  // Blocks smaller than this are never page-locked.
+  static constexpr size_t kMinPinnedBlockBytes = 64 * 1024;
+  // Most bytes of freed page-locked blocks which are kept for reuse.
+  static constexpr size_t kMaxFreePinnedBytes = 256 * 1024 * 1024;
+
+  void* AllocatePinned(size_t alignment, size_t num_bytes);
+
+  // Set when a block could not be page-locked.
+  std::atomic<bool> pinning_failed_{false};
+
+  // Sizes of the page-locked blocks which are currently allocated.
+  tensorflow::mutex mu_;
+  absl::flat_hash_map<void*, size_t> pinned_blocks_ GUARDED_BY(mu_);
+  // Page-locked blocks which have been deallocated, by size.
+  absl::flat_hash_map<size_t, std::vector<void*>> free_pinned_blocks_
+      GUARDED_BY(mu_);
+  size_t free_pinned_bytes_ GUARDED_BY(mu_) = 0;
 };
 
 }  // namespace poplarplugin
@@ -245,6 +245,11 @@ Status InfeedIterator::GetNext(std::vector<tensorflow::Tensor>* outputs,
                                bool* end_of_sequence) {
   if (cancellation_manager_.IsCancelled()) {
     *end_of_sequence = true;
+  } else if (has_warmup_element_) {
+    *outputs = std::move(warmup_outputs_);
+    *end_of_sequence = warmup_end_of_sequence_;
+    warmup_outputs_.clear();
+    has_warmup_element_ = false;
   } else {
     TF_RETURN_IF_ERROR(
         iterator_->GetNext(iterator_ctx_.get(), outputs, end_of_sequence));
@@ -252,6 +257,15 @@ Status InfeedIterator::GetNext(std::vector<tensorflow::Tensor>* outputs,
   return Status::OK();
 }
 
+Status InfeedIterator::WarmUp() {
+  if (!has_warmup_element_) {
+    TF_RETURN_IF_ERROR(iterator_->GetNext(
+        iterator_ctx_.get(), &warmup_outputs_, &warmup_end_of_sequence_));
+    has_warmup_element_ = true;
+  }
+  return Status::OK();
+}
+
 const std::vector<Shape>& InfeedIterator::GetShapes() const { return shapes_; }
 
 std::vector<std::vector<InfeedQueue*>>& InfeedIterator::GetInfeedQueues() {
@@ -129,6 +129,11 @@ class InfeedIterator {
   Status GetNext(std::vector<tensorflow::Tensor>* outputs,
                  bool* end_of_sequence);
 
+  // Fetch the first element ahead of the first call to GetNext, which starts
+  // any prefetching in the dataset pipeline. The element is returned by the
+  // next call to GetNext.
+  Status WarmUp();
+
   const std::vector<Shape>& GetShapes() const;
 
   std::vector<std::vector<InfeedQueue*>>& GetInfeedQueues();
@@ -172,6 +177,10 @@ class InfeedIterator {
   std::vector<std::vector<InfeedQueueStorage>> infeed_queues_;
   // Used by the accessor.
   std::vector<std::vector<InfeedQueue*>> infeed_queues_ptrs_;
+  // Element fetched by WarmUp which has not been returned by GetNext yet.
+  bool has_warmup_element_ = false;
+  bool warmup_end_of_sequence_ = false;
+  std::vector<tensorflow::Tensor> warmup_outputs_;
 };
 
 }  // namespace poplarplugin
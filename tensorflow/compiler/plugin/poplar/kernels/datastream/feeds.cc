@@ -170,8 +170,14 @@ REGISTER_IPU_OP("PopDatastreamInfeedDequeue", PopDatastreamInfeedDequeueOp);
 class IPUCreateDatasetIteratorOp : public OpKernel {
  public:
   explicit IPUCreateDatasetIteratorOp(OpKernelConstruction* ctx)
-      : OpKernel(ctx), device_ordinal_(0) {
+      : OpKernel(ctx),
+        device_ordinal_(0),
+        eager_warmup_(false),
+        use_pinned_host_memory_(false) {
     OP_REQUIRES_OK(ctx, ctx->GetAttr("device_ordinal", &device_ordinal_));
+    OP_REQUIRES_OK(ctx, ctx->GetAttr("eager_warmup", &eager_warmup_));
+    OP_REQUIRES_OK(ctx, ctx->GetAttr("use_pinned_host_memory",
+                                     &use_pinned_host_memory_));
     GetFeedConfig(ctx, config_);
 
     OP_REQUIRES(ctx, device_ordinal_ >= 0,
@@ -201,11 +207,17 @@ class IPUCreateDatasetIteratorOp : public OpKernel {
 
     // Pass to the correct executor
     poplar_executor->CreateInfeedIterator(config_, xla_shapes_, params, flr,
-                                          dataset);
+                                          dataset, use_pinned_host_memory_);
+    if (eager_warmup_) {
+      OP_REQUIRES_OK(
+          ctx, poplar_executor->WarmUpInfeedIterator(config_.feed_id()));
+    }
   }
 
  private:
   int device_ordinal_;
+  bool eager_warmup_;
+  bool use_pinned_host_memory_;
   xla::poplarplugin::PoplarFeedConfig config_;
   std::vector<xla::Shape> xla_shapes_;
   TF_DISALLOW_COPY_AND_ASSIGN(IPUCreateDatasetIteratorOp);
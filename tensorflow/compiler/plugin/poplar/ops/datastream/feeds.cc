@@ -62,6 +62,8 @@ REGISTER_OP("IPUCreateDatasetIterator")
     .Attr("prefetch_depth: int = 1")
     .Attr("output_types: list(type) >= 1")
     .Attr("output_shapes: list(shape) >= 1")
+    .Attr("eager_warmup: bool = false")
+    .Attr("use_pinned_host_memory: bool = false")
     .SetIsStateful()
     .SetShapeFn(shape_inference::NoOutputs);
 
@@ -71,7 +71,7 @@ class MultiIpuTest(xla_test.XLATestCase):
 
       report.parse_log()
       tm = report.get_tensor_map()
-      mods = tm.computation_names()
+      mods = list(tm.computation_names())
       self.assertEqual(len(mods), 1)
 
       tiles = tm.tile_ids(mods[0])
@@ -182,7 +182,7 @@ class MultiIpuTest(xla_test.XLATestCase):
 
       report.parse_log()
       tm = report.get_tensor_map()
-      mods = tm.computation_names()
+      mods = list(tm.computation_names())
       self.assertEqual(len(mods), 1)
 
       tiles = tm.tile_ids(mods[0])
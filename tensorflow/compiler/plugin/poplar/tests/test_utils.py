@@ -20,10 +20,13 @@ from __future__ import print_function
 import collections
 import contextlib
 import fnmatch
+import functools
+import itertools
 import json as js
 import re
 import numpy as np
 
+from tensorflow.compiler.plugin.poplar.driver.config_pb2 import IpuOptions
 from tensorflow.compiler.plugin.poplar.driver.trace_pb2 import IpuTraceEvent
 from tensorflow.compiler.plugin.poplar.ops import gen_ipu_ops
 from tensorflow.core.framework import attr_value_pb2
@@ -35,15 +38,57 @@ from tensorflow.python.ops import math_ops
 from tensorflow.python.ipu import utils
 
 
-def compute_device_count(pipelining=False, sharded=False, replicated=False):
-  if sharded:
-    device_count = 2 * (2 if replicated else 1)
-  elif pipelining:
-    device_count = 4 * (2 if replicated else 1)
-  else:
-    device_count = 2 if replicated else 0
+# A lookahead, so that overlapping matches such as the two stages in
+# "_stage_1_stage_2_" are all found.
+_STAGE_RE = re.compile(r"(?=_stage_(\d+)_)")
+
+# Maps (sharded, pipelining) to the device count without and with
+# replication.
+_DEVICE_COUNTS = {
+    (False, False): (0, 2),
+    (False, True): (4, 8),
+    (True, False): (2, 4),
+    (True, True): (2, 4),
+}
 
-  return device_count
+
+def compute_device_count(pipelining=False, sharded=False, replicated=False):
+  return _DEVICE_COUNTS[(bool(sharded), bool(pipelining))][bool(replicated)]
+
+
+# Most tests configure the IPU system with the same handful of options, so
+# cache the serialized configuration rather than rebuilding it every time.
+@functools.lru_cache(maxsize=32)
+def _build_ipu_config_bytes(profiling, compile_ipu_code, device_count,
+                            execution_trace, max_cross_replica_sum_buffer_size,
+                            max_inter_ipu_copies_buffer_size,
+                            merge_infeed_io_copies,
+                            always_rearrange_copies_on_the_host,
+                            serialization_folder, allow_recompute,
+                            use_stable_norm_statistics):
+  opts = utils.create_ipu_config(
+      profiling=profiling,
+      use_poplar_text_report=False,
+      use_poplar_cbor_report=False,
+      profile_execution=execution_trace,
+      always_rearrange_copies_on_the_host=always_rearrange_copies_on_the_host,
+      merge_infeed_io_copies=merge_infeed_io_copies)
+
+  opts = utils.set_optimization_options(
+      opts,
+      max_cross_replica_sum_buffer_size=max_cross_replica_sum_buffer_size,
+      max_inter_ipu_copies_buffer_size=max_inter_ipu_copies_buffer_size)
+
+  if device_count:
+    opts = utils.auto_select_ipus(opts, device_count)
+
+  opts = utils.set_serialization_options(opts, serialization_folder)
+  opts = utils.set_ipu_model_options(opts, compile_ipu_code)
+  opts = utils.set_recomputation_options(opts, allow_recompute=allow_recompute)
+
+  opts = utils.set_norm_options(
+      opts, use_stable_statistics=use_stable_norm_statistics)
+  return opts.SerializeToString()
 
 
 @contextlib.contextmanager
@@ -52,13 +97,22 @@ def ipu_session():
     yield sess
 
 
+@functools.lru_cache(maxsize=1024)
+def _compile_pattern(pattern):
+  return re.compile(fnmatch.translate(pattern))
+
+
+def _compile_pattern_union(patterns):
+  # An empty union must not match anything.
+  if not patterns:
+    return re.compile('(?!)')
+  return re.compile('|'.join('(?:%s)' % fnmatch.translate(p)
+                             for p in patterns))
+
+
 def items_matching_at_least_one_pattern(items, patterns):
-  matches = []
-  patterns = [x + '*' for x in patterns]
-  for item in items:
-    if [p for p in patterns if fnmatch.fnmatch(item, p)]:
-      matches.append(item)
-  return matches
+  union = _compile_pattern_union([x + '*' for x in patterns])
+  return [item for item in items if union.match(item)]
 
 
 def names_in_blacklist(names, blacklist):
@@ -66,25 +120,23 @@ def names_in_blacklist(names, blacklist):
 
 
 def missing_names_in_whitelist_entries(names, whitelist):
-  fail_list = []
-  wl = ['*' + x + '*' for x in whitelist]
-  for name in names:
-    if name and not [x for x in wl if fnmatch.fnmatch(name, x)]:
-      fail_list += [name]
-  return fail_list
+  union = _compile_pattern_union(['*' + x + '*' for x in whitelist])
+  return [name for name in names if name and not union.match(name)]
 
 
 def missing_whitelist_entries_in_names(names, whitelist):
   fail_list = []
   wl = ['*' + x + '*' for x in whitelist]
   for x in wl:
-    if not [name for name in names if fnmatch.fnmatch(name, x)]:
+    pattern = _compile_pattern(x)
+    if not any(pattern.match(name) for name in names):
       fail_list += [x]
   return fail_list
 
 
 def count_matches_in_list(input_list, to_match):
-  return len([s for s in input_list if fnmatch.fnmatch(s, to_match)])
+  pattern = _compile_pattern(to_match)
+  return sum(1 for s in input_list if pattern.match(s))
 
 
 class TensorMap(object):
@@ -98,7 +150,7 @@ class TensorMap(object):
 
   class Tensor(object):
     def __init__(self, inst, index, shape, dtype, has_constant, has_aliases,
-                 num_elements, tiles, name):
+                 num_elements, tile_array, name):
       self.inst = inst
       self.index = index
       self.shape = shape
@@ -106,11 +158,23 @@ class TensorMap(object):
       self.has_constant = has_constant
       self.has_aliases = has_aliases
       self.num_elements = num_elements
-      self.tiles = tiles
+      # Array of shape [num_tiles, 2] holding (tile, num_elements) pairs.
+      self.tile_array = tile_array
+      self._tiles = None
       self.name = name
 
+    @property
+    def tiles(self):
+      # Only materialize the Tile objects if a caller asks for them.
+      if self._tiles is None:
+        self._tiles = [
+            TensorMap.Tile(int(tile), int(num_elements))
+            for tile, num_elements in self.tile_array
+        ]
+      return self._tiles
+
     def tile_ids(self):
-      return list({t.tile for t in self.tiles})
+      return np.unique(self.tile_array[:, 0]).tolist()
 
     @property
     def id(self):
@@ -119,13 +183,12 @@ class TensorMap(object):
   def __init__(self, tensor_map, num_tiles_per_ipu):
     self.num_tiles_per_ipu = num_tiles_per_ipu
     self.mappings = {}
+    self._per_comp_tile_ids = {}
     for comp, js_tensors in tensor_map["mappings"].items():
       tensors = []
       for js_tensor in js_tensors:
-        tiles = []
-        for tile in js_tensor[7]:
-          assert len(tile) == 2
-          tiles.append(TensorMap.Tile(tile[0], tile[1]))
+        tile_array = np.asarray(js_tensor[7], dtype=np.int32).reshape(-1, 2)
+        assert len(tile_array) == len(js_tensor[7])
         tensors.append(
             TensorMap.Tensor(inst=js_tensor[0],
                              index=js_tensor[1],
@@ -134,32 +197,31 @@ class TensorMap(object):
                              has_constant=bool(js_tensor[4]),
                              has_aliases=bool(js_tensor[5]),
                              num_elements=js_tensor[6],
-                             tiles=tiles,
+                             tile_array=tile_array,
                              name=js_tensor[8]))
       self.mappings[comp] = tensors
+      tile_ids = set()
+      for tensor in tensors:
+        tile_ids.update(tensor.tile_array[:, 0].tolist())
+      self._per_comp_tile_ids[comp] = frozenset(tile_ids)
 
   def all_tensors(self):
-    for _, tensors in self.mappings.items():
-      for tensor in tensors:
-        yield tensor
+    return itertools.chain.from_iterable(self.mappings.values())
 
   def tile_ids(self, computation=None):
     if isinstance(computation, list):
       computations = computation
     else:
       computations = [computation] if computation else self.mappings.keys()
-    ids = set()
-    for c in computations:
-      for tensor in self.mappings[c]:
-        ids.update(tensor.tile_ids())
-    return ids
+    return frozenset().union(*(self._per_comp_tile_ids[c]
+                               for c in computations))
 
   def ipu_ids(self, computation=None):
     tile_ids = self.tile_ids(computation)
-    return {int(tile_id / self.num_tiles_per_ipu) for tile_id in tile_ids}
+    return {int(tile_id // self.num_tiles_per_ipu) for tile_id in tile_ids}
 
   def computation_names(self):
-    return list(self.mappings.keys())
+    return self.mappings.keys()
 
   def tensor_inst_name_mappings(self):
     mappings = {}
@@ -199,6 +261,13 @@ class ReportJSON(object):
     self.test = test
     self.sess = sess
     self.eager_mode = eager_mode
+    # COMPILE_BEGIN and LOAD_ENGINE events carry nothing to parse.
+    self._event_handlers = {
+        IpuTraceEvent.COMPILE_END: self._handle_compile_end,
+        IpuTraceEvent.HOST_TO_DEVICE_TRANSFER: self._handle_data_transfer,
+        IpuTraceEvent.DEVICE_TO_HOST_TRANSFER: self._handle_data_transfer,
+        IpuTraceEvent.EXECUTE: self._handle_execute,
+    }
 
     assert not eager_mode or not sess, "Sessions can't be used in eager mode"
 
@@ -207,39 +276,27 @@ class ReportJSON(object):
     if sess:
       self.create_ipu_event_trace()
     if (sess or estimator_hook or eager_mode) and configure_device:
-      # yapf: disable
-      assert not (pipelining and device_count_override
-                 ), "Can't have both pipelining enabled and device_count_override"
-      assert not (sharded and device_count_override
-                 ), "Can't have both sharded enabled and device_count_override"
-      # yapf: enable
-
-      opts = utils.create_ipu_config(
-          profiling=profiling,
-          use_poplar_text_report=False,
-          use_poplar_cbor_report=False,
-          profile_execution=execution_trace,
-          always_rearrange_copies_on_the_host=
-          always_rearrange_copies_on_the_host,
-          merge_infeed_io_copies=merge_infeed_io_copies)
-
-      opts = utils.set_optimization_options(
-          opts,
-          max_cross_replica_sum_buffer_size=max_cross_replica_sum_buffer_size,
-          max_inter_ipu_copies_buffer_size=max_inter_ipu_copies_buffer_size)
+      assert not ((pipelining or sharded) and device_count_override), (
+          "Can't have both pipelining/sharded enabled and"
+          " device_count_override")
 
       device_count = device_count_override or compute_device_count(
           pipelining, sharded, replicated)
-      if device_count:
-        opts = utils.auto_select_ipus(opts, device_count)
-
-      opts = utils.set_serialization_options(opts, serialization_folder)
-      opts = utils.set_ipu_model_options(opts, compile_ipu_code)
-      opts = utils.set_recomputation_options(opts,
-                                             allow_recompute=allow_recompute)
-
-      opts = utils.set_norm_options(
-          opts, use_stable_statistics=use_stable_norm_statistics)
+      opts = IpuOptions.FromString(
+          _build_ipu_config_bytes(
+              profiling=profiling,
+              compile_ipu_code=compile_ipu_code,
+              device_count=device_count,
+              execution_trace=execution_trace,
+              max_cross_replica_sum_buffer_size=
+              max_cross_replica_sum_buffer_size,
+              max_inter_ipu_copies_buffer_size=max_inter_ipu_copies_buffer_size,
+              merge_infeed_io_copies=merge_infeed_io_copies,
+              always_rearrange_copies_on_the_host=
+              always_rearrange_copies_on_the_host,
+              serialization_folder=serialization_folder,
+              allow_recompute=allow_recompute,
+              use_stable_norm_statistics=use_stable_norm_statistics))
 
       if set_opts_fn:
         opts = set_opts_fn(opts)
@@ -295,14 +352,18 @@ class ReportJSON(object):
   def assert_num_events(self, num_expected, assert_msg=""):
     self.test.assertEqual(num_expected, self.num_events, assert_msg)
 
+  @staticmethod
+  def _get_event_string(e):
+    if isinstance(e, ops.Tensor):
+      e = e.numpy()
+    assert isinstance(e, (bytes, str))
+    return e
+
   def get_events_from_log(self, log):
     events_types = collections.defaultdict(int)
     events = []
     for e in log:
-      if isinstance(e, ops.Tensor):
-        e = e.numpy()
-      assert isinstance(e, (bytes, str))
-      evt = IpuTraceEvent.FromString(e)
+      evt = IpuTraceEvent.FromString(self._get_event_string(e))
       events_types[evt.type] += 1
       events.append(evt)
     return events_types, events
@@ -311,46 +372,58 @@ class ReportJSON(object):
     self.num_events = len(events)
     if assert_len:
       self.assert_num_events(assert_len, assert_msg)
-    events_types, trace_events = self.get_events_from_log(events)
     self.tensor_map = None
     self.events = {}
     self.instruction_info = {}
-    for evt in trace_events:
-      try:
-        if evt.type == IpuTraceEvent.COMPILE_BEGIN:
-          pass
-        if evt.type == IpuTraceEvent.COMPILE_END:
-          if evt.compile_end.compilation_report:
-            assert IpuTraceEvent.COMPILE_END not in self.events
-            self.events[IpuTraceEvent.COMPILE_END] = js.loads(
-                evt.compile_end.compilation_report, encoding="utf-8")
-            self.tensor_map = TensorMap(
-                js.loads(evt.compile_end.tensor_map, encoding="utf-8"),
-                self.get_num_tiles_per_ipu())
-            self.instruction_info = js.loads(evt.compile_end.instruction_info,
-                                             encoding="utf-8")
-        if evt.type == IpuTraceEvent.HOST_TO_DEVICE_TRANSFER:
-          if evt.data_transfer.data_transfer:
-            assert IpuTraceEvent.HOST_TO_DEVICE_TRANSFER not in self.events
-            self.events[IpuTraceEvent.HOST_TO_DEVICE_TRANSFER] = js.loads(
-                evt.data_transfer.data_transfer, encoding="utf-8")
-        if evt.type == IpuTraceEvent.DEVICE_TO_HOST_TRANSFER:
-          if evt.data_transfer.data_transfer:
-            assert IpuTraceEvent.DEVICE_TO_HOST_TRANSFER not in self.events
-            self.events[IpuTraceEvent.DEVICE_TO_HOST_TRANSFER] = js.loads(
-                evt.data_transfer.data_transfer, encoding="utf-8")
-        if evt.type == IpuTraceEvent.LOAD_ENGINE:
+    self._tile_memory = None
+    self._always_live_memory = None
+    self._programs_by_type = collections.defaultdict(list)
+    events_types = collections.defaultdict(int)
+    # The handlers copy everything they need out of the event, so a single
+    # message can be reused to decode all of them.
+    evt = IpuTraceEvent()
+    for e in events:
+      evt.Clear()
+      evt.MergeFromString(self._get_event_string(e))
+      events_types[evt.type] += 1
+      handler = self._event_handlers.get(evt.type)
+      if handler:
+        try:
+          handler(evt)
+        except UnicodeDecodeError:
           pass
-        if evt.type == IpuTraceEvent.EXECUTE:
-          if evt.execute.execution_report:
-            self.events[IpuTraceEvent.EXECUTE] = self.events.get(
-                IpuTraceEvent.EXECUTE, []) + [
-                    js.loads(evt.execute.execution_report, encoding="utf-8")
-                ]
-      except UnicodeDecodeError:
-        pass
     return events_types
 
+  def _handle_compile_end(self, evt):
+    compile_end = evt.compile_end
+    if compile_end.compilation_report:
+      assert IpuTraceEvent.COMPILE_END not in self.events
+      report = js.loads(compile_end.compilation_report)
+      self.events[IpuTraceEvent.COMPILE_END] = report
+      self.tensor_map = TensorMap(js.loads(compile_end.tensor_map),
+                                  self.get_num_tiles_per_ipu())
+      self.instruction_info = js.loads(compile_end.instruction_info)
+      for p in report.get("programs", []):
+        self._programs_by_type[p['type']].append(p)
+      memory = report.get("memory")
+      if memory:
+        self._tile_memory = np.asarray(memory["byTile"]["total"],
+                                       dtype=np.int64)
+        self._always_live_memory = np.asarray(
+            memory["liveness"]["alwaysLive"]["bytesByTile"], dtype=np.int64)
+
+  def _handle_data_transfer(self, evt):
+    data_transfer = evt.data_transfer.data_transfer
+    if data_transfer:
+      assert evt.type not in self.events
+      self.events[evt.type] = js.loads(data_transfer)
+
+  def _handle_execute(self, evt):
+    execution_report = evt.execute.execution_report
+    if execution_report:
+      self.events.setdefault(IpuTraceEvent.EXECUTE,
+                             []).append(js.loads(execution_report))
+
   def get_host_to_device_event_names(self):
     return [
         t["name"]
@@ -369,10 +442,11 @@ class ReportJSON(object):
         len(
             self.events.get(IpuTraceEvent.HOST_TO_DEVICE_TRANSFER,
                             {}).get("tensors", [])), msg)
+    counter = collections.Counter(self.get_host_to_device_event_names())
     for name in names:
+      pattern = _compile_pattern(name)
       self.test.assertEqual(
-          count_matches_in_list(self.get_host_to_device_event_names(), name),
-          1, msg)
+          sum(v for k, v in counter.items() if pattern.match(k)), 1, msg)
 
   def assert_device_to_host_event_names(self, names, msg=None):
     self.test.assertEqual(
@@ -380,10 +454,11 @@ class ReportJSON(object):
         len(
             self.events.get(IpuTraceEvent.DEVICE_TO_HOST_TRANSFER,
                             {}).get("tensors", [])), msg)
+    counter = collections.Counter(self.get_device_to_host_event_names())
     for name in names:
+      pattern = _compile_pattern(name)
       self.test.assertEqual(
-          count_matches_in_list(self.get_device_to_host_event_names(), name),
-          1, msg)
+          sum(v for k, v in counter.items() if pattern.match(k)), 1, msg)
 
   def assert_num_execution_reports_equal(self, num):
     self.test.assertEqual(len(self.get_execution_reports()), num)
@@ -393,14 +468,13 @@ class ReportJSON(object):
 
   # Excluding gaps
   def get_max_tile_memory(self):
-    return max(self.get_each_tile_memory())
+    return int(self._tile_memory.max())
 
   def get_always_live_memory(self):
-    return sum(self.events[IpuTraceEvent.COMPILE_END]["memory"]["liveness"]
-               ["alwaysLive"]["bytesByTile"])
+    return int(self._always_live_memory.sum())
 
   def get_total_tile_memory(self):
-    return sum(self.get_each_tile_memory())
+    return int(self._tile_memory.sum())
 
   def get_vertices(self):
     return self.events[IpuTraceEvent.COMPILE_END]["vertexTypes"]["names"]
@@ -415,11 +489,9 @@ class ReportJSON(object):
     return self.instruction_info
 
   def get_ml_type_counts(self):
-    res = [0, 0, 0, 0]
-    for i in self.instruction_info['ml_types'].values():
-      ml_type = i - 1
-      res[ml_type] = res[ml_type] + 1
-    return res
+    ml_types = np.fromiter(self.instruction_info['ml_types'].values(),
+                           dtype=np.int32)
+    return np.bincount(ml_types - 1, minlength=4).tolist()
 
   def assert_no_compute_set(self):
     self.test.assertFalse(
@@ -451,7 +523,7 @@ class ReportJSON(object):
       self.test.assertEqual(
           len(names), 1, "More than one match for '%s' : %s" % (inst, names))
       self.test.assertTrue(
-          fnmatch.fnmatch(mappings[names[0]], expected_name),
+          fnmatch.fnmatchcase(mappings[names[0]], expected_name),
           "Name '%s' for instruction '%s' does not match expected pattern '%s'"
           % (mappings[names[0]], names[0], expected_name))
 
@@ -467,7 +539,7 @@ class ReportJSON(object):
         m = re.match("XLA_Args/(.*)", mangled)
       assert m
       self.test.assertTrue(
-          fnmatch.fnmatch(m.group(1), expected_name),
+          fnmatch.fnmatchcase(m.group(1), expected_name),
           "Name '%s' for argument %d does not match expected pattern '%s'" %
           (m.group(1), arg_num, expected_name))
 
@@ -481,29 +553,25 @@ class ReportJSON(object):
     return self.get_num_tiles() / self.get_num_ipus()
 
   def get_first_program_of_type(self, program_type):
-    for p in self.events[IpuTraceEvent.COMPILE_END]["programs"]:
-      if program_type == p['type']:
-        return p
-    return None
+    programs = self._programs_by_type.get(program_type)
+    return programs[0] if programs else None
 
   def get_program_names_of_type(self, program_type):
-    return [
-        p['name'] for p in self.events[IpuTraceEvent.COMPILE_END]["programs"]
-        if p['type'] == program_type
-    ]
+    return [p['name'] for p in self._programs_by_type.get(program_type, [])]
 
   def get_program(self, index=0):
     return self.events[IpuTraceEvent.COMPILE_END]["programs"][index]
 
   def assert_pipeline_stages_on_expected_ipu(self, expected_ipus):
-    self.test.assertFalse(
-        items_matching_at_least_one_pattern(
-            self.tensor_map.computation_names(),
-            ["*_stage_%d_" % (len(expected_ipus) + 1)]),
+    stages = collections.defaultdict(list)
+    for c in self.tensor_map.computation_names():
+      for stage in set(_STAGE_RE.findall(c)):
+        stages[int(stage)].append(c)
+    self.test.assertNotIn(
+        len(expected_ipus) + 1, stages,
         "The number of expected_ipus does not match the number of stages")
     for i, expected_ipu in enumerate(expected_ipus):
-      stage = items_matching_at_least_one_pattern(
-          self.tensor_map.computation_names(), ["*_stage_%d_" % i])
+      stage = stages.get(i)
       self.test.assertTrue(stage, "No stage %d found" % i)
       ipus = self.tensor_map.ipu_ids(stage)
       if ipus:
@@ -517,7 +585,10 @@ class ReportJSON(object):
   def assert_each_tile_memory_is_less_than(self, expected, tolerance=0.01):
     low = 0
     high = int(expected * (1.0 + tolerance))
-    self.test.assertAllInRange(self.get_each_tile_memory(), low, high)
+    in_range = (self._tile_memory >= low) & (self._tile_memory <= high)
+    self.test.assertTrue(
+        np.all(in_range), "Tiles %s are not in the range [%d, %d]" %
+        (np.flatnonzero(~in_range).tolist(), low, high))
 
   def assert_total_tile_memory(self, expected, tolerance=0.01):
     low = int(expected * (1.0 - tolerance))
@@ -592,20 +663,31 @@ class ReportJSON(object):
                           num_matches, msg)
 
 
+# Default element shapes and types of the increasing datasets.
+_DEFAULT_SHAPES = ((1, 32, 32, 4), (1, 8))
+_DEFAULT_DTYPES = (np.float32, np.float32)
+
+
 def create_multi_increasing_dataset(value,
                                     shapes=None,
                                     dtypes=None,
                                     repeat=True):
   # Default values:
-  shapes = shapes if shapes else [[1, 32, 32, 4], [1, 8]]
-  dtypes = dtypes if dtypes else [np.float32, np.float32]
+  shapes = shapes if shapes else _DEFAULT_SHAPES
+  dtypes = dtypes if dtypes else _DEFAULT_DTYPES
 
   def _get_one_input(data):
     result = []
-    for i, shape in enumerate(shapes):
-      result.append(
-          math_ops.cast(gen_array_ops.broadcast_to(data, shape=shape),
-                        dtype=dtypes[i]))
+    if len(set(dtypes)) == 1:
+      # Cast the scalar once and broadcast it to every shape.
+      base = math_ops.cast(data, dtype=dtypes[0])
+      for shape in shapes:
+        result.append(gen_array_ops.broadcast_to(base, shape=shape))
+    else:
+      for i, shape in enumerate(shapes):
+        result.append(
+            math_ops.cast(gen_array_ops.broadcast_to(data, shape=shape),
+                          dtype=dtypes[i]))
     return result
 
   dataset = Dataset.range(value).map(_get_one_input)
@@ -619,11 +701,11 @@ def create_dual_increasing_dataset(value,
                                    label_shape=None,
                                    dtype=np.float32,
                                    repeat=True):
-  data_shape = data_shape if data_shape else [1, 32, 32, 4]
-  label_shape = label_shape if label_shape else [1, 8]
+  data_shape = data_shape if data_shape else _DEFAULT_SHAPES[0]
+  label_shape = label_shape if label_shape else _DEFAULT_SHAPES[1]
   return create_multi_increasing_dataset(value,
-                                         shapes=[data_shape, label_shape],
-                                         dtypes=[dtype, dtype],
+                                         shapes=(data_shape, label_shape),
+                                         dtypes=(dtype, dtype),
                                          repeat=repeat)
 
 
@@ -631,10 +713,10 @@ def create_single_increasing_dataset(value,
                                      shape=None,
                                      dtype=np.float32,
                                      repeat=True):
-  shape = shape if shape is not None else [1, 32, 32, 4]
+  shape = shape if shape is not None else _DEFAULT_SHAPES[0]
   return create_multi_increasing_dataset(value,
-                                         shapes=[shape],
-                                         dtypes=[dtype],
+                                         shapes=(shape,),
+                                         dtypes=(dtype,),
                                          repeat=repeat)
 
 
@@ -647,12 +729,14 @@ def move_variable_initialization_to_cpu():
   ]
   visited = set()
 
-  while dep_ops:
-    op = dep_ops.pop()
-    if not op in visited:
-      visited.add(op)
-      init_ops += [op]
-      dep_ops += [x.op for x in op.inputs]
+  queue = collections.deque(dep_ops)
+  while queue:
+    op = queue.popleft()
+    op_id = id(op)
+    if op_id not in visited:
+      visited.add(op_id)
+      init_ops.append(op)
+      queue.extend(x.op for x in op.inputs)
 
   # pylint: disable=protected-access
   for op in init_ops:
@@ -17,6 +17,9 @@ Infeed queue
 ~~~~~~~~~~~~
 """
 
+import functools
+import operator
+
 from tensorflow.compiler.plugin.poplar.ops import gen_pop_datastream_ops
 from tensorflow.python.eager import context
 from tensorflow.python.data.ops import dataset_ops
@@ -25,6 +28,39 @@ from tensorflow.python.framework import ops
 from tensorflow.python.ipu import loops
 
 
+# Accessor for the variant tensor of a dataset, picked once for the version of
+# tf.data in use.
+_VARIANT_GETTER = operator.attrgetter(
+    "_variant_tensor" if hasattr(dataset_ops.DatasetV2, "_variant_tensor") else
+    "_as_variant_tensor")
+
+# Static tf.data optimizations which are enabled on infeed datasets unless the
+# user has configured them explicitly.
+_DEFAULT_OPTIMIZATIONS = ("filter_fusion", "map_and_batch_fusion", "map_fusion",
+                          "noop_elimination")
+
+
+def _default_optimization_options(dataset):
+  """Returns `tf.data.Options` enabling the default infeed optimizations which
+  have not already been set on `dataset`."""
+  user_optimization = dataset.options().experimental_optimization
+  options = dataset_ops.Options()
+  optimization = options.experimental_optimization
+  for name in _DEFAULT_OPTIMIZATIONS:
+    if getattr(user_optimization, name) is None:
+      setattr(optimization, name, True)
+  return options
+
+
+def _elements_per_transfer(output_types, output_shapes, coalesce_bytes):
+  """Returns the number of dataset elements, at least one, which fit in a
+  single host transfer of `coalesce_bytes` bytes."""
+  element_bytes = sum(
+      dtype.size * shape.num_elements()
+      for dtype, shape in zip(output_types, output_shapes))
+  return max(1, coalesce_bytes // max(1, element_bytes))
+
+
 class IPUInfeedQueue:
   """Wraps a tf.Dataset object with infeed operations specific to the IPU.
 
@@ -93,7 +129,12 @@ class IPUInfeedQueue:
                device_ordinal=0,
                replication_factor=1,
                data_to_prefetch=1,
-               prefetch_depth=None):
+               prefetch_depth=None,
+               optimization_options=None,
+               prefetch_buffer_size=None,
+               eager_warmup=False,
+               use_pinned_host_memory=False,
+               coalesce_bytes=None):
     """Creates an IPUInfeedQueue object.
 
     Args:
@@ -128,6 +169,40 @@ class IPUInfeedQueue:
           allows for prefetching of multiple entries, increasing the probability
           there will be a valid entry in the buffer for the device to read
           before falling back to synchronously fetching the next entry.
+        optimization_options: a `tf.data.Options` object to apply to the
+          dataset. By default the static map, filter and batch fusions and
+          no-op elimination are enabled, apart from any of them which have
+          already been configured on the dataset. Other optimizations, such as
+          `experimental_optimization.map_vectorization`, which can change the
+          behaviour of stateful or shape dependent map functions, must be
+          enabled explicitly through these options.
+        prefetch_buffer_size: if set, the number of batches the host dataset
+          pipeline will prepare ahead of the infeed, or
+          `tf.data.experimental.AUTOTUNE` to tune it at runtime. The batches
+          are held in host memory in addition to the `prefetch_depth` entries
+          of the device data stream. By default, or when set to 0, no
+          prefetching stage is added to the dataset.
+        eager_warmup: if True, the initializer fetches the first element of the
+          dataset, so that shuffle buffers and prefetching are filled while the
+          model is being compiled rather than on the first step. Running the
+          `initializer` then creates the infeed and starts its pipeline in a
+          single `session.run` call, and the fetched element is still the
+          first one returned by the infeed. Any resources used by the dataset,
+          such as lookup tables, must be initialized before the infeed
+          initializer is run.
+        use_pinned_host_memory: if True, the larger host buffers which hold
+          the batches of the dataset, 64KB or more, are allocated in whole
+          pages and the operating system is asked to page-lock them. If it
+          refuses once, all later buffers use pageable memory. This can reduce
+          page faults while the data is being copied to the IPU. Up to 256MB
+          of locked buffers are kept for reuse until the device is released,
+          which reduces the memory available to the rest of the system, so it
+          is disabled by default.
+        coalesce_bytes: if set, each time we sync with the CPU we return as many
+          dataset values as fit in this number of bytes, and at least one. This
+          sets `data_to_prefetch` from the size of the dataset elements, and
+          the same caveats apply. It cannot be used together with
+          `data_to_prefetch`.
 
     Raises:
       ValueError: if all dimensions of shapes of dataset.output_shapes are not
@@ -136,12 +211,16 @@ class IPUInfeedQueue:
 
     """
 
-    for output_shape in dataset._flat_structure["output_shapes"]:
-      if isinstance(output_shape, list) or isinstance(output_shape, tuple):
-        raise ValueError("Nested list/tuple input shapes are not supported")
-      if not output_shape.is_fully_defined():
-        raise ValueError("""Output shape {} is not fully defined. If using \
-tf.Dataset.batch, set `drop_remainder=True`.""".format(output_shape))
+    flat_structure = dataset._flat_structure  # pylint: disable=protected-access
+    output_types = tuple(flat_structure["output_types"])
+    output_shapes = tuple(flat_structure["output_shapes"])
+    if any(isinstance(s, (list, tuple)) for s in output_shapes):
+      raise ValueError("Nested list/tuple input shapes are not supported")
+    undefined_shape = next(
+        (s for s in output_shapes if not s.is_fully_defined()), None)
+    if undefined_shape is not None:
+      raise ValueError("""Output shape {} is not fully defined. If using \
+tf.Dataset.batch, set `drop_remainder=True`.""".format(undefined_shape))
     if prefetch_depth is None:
       prefetch_depth = 1
     if prefetch_depth <= 0:
@@ -152,27 +231,48 @@ tf.Dataset.batch, set `drop_remainder=True`.""".format(output_shape))
       raise ValueError(
           "prefetch_depth must be less than 256, but it is {}".format(
               prefetch_depth))
+    if coalesce_bytes is not None:
+      if data_to_prefetch not in (0, 1):
+        raise ValueError(
+            "data_to_prefetch and coalesce_bytes cannot both be set")
+      if coalesce_bytes <= 0:
+        raise ValueError(
+            "coalesce_bytes must be greater than zero, but it is {}".format(
+                coalesce_bytes))
+      data_to_prefetch = _elements_per_transfer(output_types, output_shapes,
+                                                coalesce_bytes)
 
     with ops.device('/device:CPU:0'):
       self._replication_factor = replication_factor
       self._dataset = dataset
       self._structure = dataset_ops.get_structure(self._dataset)
-      self._flat_structure = dataset._flat_structure
+      self._repack = functools.partial(structure.from_tensor_list,
+                                       self._structure)
+      self._flat_structure = flat_structure
+      self._dequeue_output_types = output_types
+      self._dequeue_output_shapes = output_shapes
       self._device_ordinal = device_ordinal
       self._prefetch_depth = prefetch_depth
+      self._eager_warmup = eager_warmup
+      self._use_pinned_host_memory = use_pinned_host_memory
 
-      # We use max to clamp 0/1 to the same value.
-      self._io_batch_size = max(1, data_to_prefetch)
+      # Values below 1 (0 included) mean no prefetching, the same as 1.
+      self._io_batch_size = data_to_prefetch if data_to_prefetch > 1 else 1
 
-      # Batch the dataset to take replication and prefetch into account.
+      # Batch the dataset to take replication and prefetch into account. The
+      # replicas are not given their own dimension here - the infeed splits
+      # dimension 0 of each batch into `replication_factor` contiguous views.
+      batch_size = self._io_batch_size * self._replication_factor
+      if batch_size != 1:
+        self._dataset = self._dataset.batch(batch_size, drop_remainder=True)
 
-      if self._io_batch_size != 1:
-        self._dataset = self._dataset.batch(self._io_batch_size,
-                                            drop_remainder=True)
+      # Optionally let the host pipeline run ahead of the infeed.
+      if prefetch_buffer_size:
+        self._dataset = self._dataset.prefetch(prefetch_buffer_size)
 
-      if self._replication_factor != 1:
-        self._dataset = self._dataset.batch(self._replication_factor,
-                                            drop_remainder=True)
+      if optimization_options is None:
+        optimization_options = _default_optimization_options(self._dataset)
+      self._dataset = self._dataset.with_options(optimization_options)
 
       # Apply the dataset and take ownership.
       self._dataset = self._dataset._apply_options()
@@ -180,24 +280,13 @@ tf.Dataset.batch, set `drop_remainder=True`.""".format(output_shape))
       # ID used for differentiating between datasets.
       self._id = str(feed_name)
 
-      try:
-        ds_variant = self._dataset._variant_tensor  # pylint: disable=protected-access
-      except TypeError:
-        ds_variant = self._dataset._as_variant_tensor  # pylint: disable=protected-access
-
       if not context.executing_eagerly():
         # For Estimators, the graph can be frozen before the estimator calls
         # the initilizer or deleter methods.  So we need to create the
         # initialize and delete operations early.  For eager execution in
         # TF2, the operations execute eagerly, so they don't exist in any
         # frozen graph.
-        with ops.colocate_with(ds_variant):
-          self._init_op = gen_pop_datastream_ops.ipu_create_dataset_iterator(
-              input_dataset=ds_variant,
-              feed_id=self._id,
-              replication_factor=self._replication_factor,
-              device_ordinal=self._device_ordinal,
-              **self._dataset._flat_structure)  # pylint: disable=protected-access
+        self._init_op = self._create_iterator(self._eager_warmup)
 
         self._deleter = gen_pop_datastream_ops.ipu_delete_dataset_iterator(
             feed_id=self._id, device_ordinal=self._device_ordinal)
@@ -218,11 +307,12 @@ tf.Dataset.batch, set `drop_remainder=True`.""".format(output_shape))
     flat_ret = gen_pop_datastream_ops.pop_datastream_infeed_dequeue(
         feed_id=self._id,
         replication_factor=self._replication_factor,
+        output_types=self._dequeue_output_types,
+        output_shapes=self._dequeue_output_shapes,
         io_batch_size=self._io_batch_size,
-        prefetch_depth=self._prefetch_depth,
-        **self._flat_structure)
+        prefetch_depth=self._prefetch_depth)
     self._dequeued = True
-    return structure.from_tensor_list(self._structure, flat_ret)
+    return self._repack(flat_ret)
 
   @property
   def dequeued(self):
@@ -250,18 +340,7 @@ tf.Dataset.batch, set `drop_remainder=True`.""".format(output_shape))
       ValueError: if the function `initializer` has already been called.
     """
     if context.executing_eagerly():
-      try:
-        ds_variant = self._dataset._variant_tensor  # pylint: disable=protected-access
-      except TypeError:
-        ds_variant = self._dataset._as_variant_tensor  # pylint: disable=protected-access
-
-      with ops.colocate_with(ds_variant):
-        return gen_pop_datastream_ops.ipu_create_dataset_iterator(
-            input_dataset=ds_variant,
-            feed_id=self._id,
-            replication_factor=self._replication_factor,
-            device_ordinal=self._device_ordinal,
-            **self._dataset._flat_structure)  # pylint: disable=protected-access
+      return self._create_iterator(self._eager_warmup)
 
     if self._initialized:
       raise ValueError(
@@ -270,6 +349,18 @@ tf.Dataset.batch, set `drop_remainder=True`.""".format(output_shape))
     self._initialized = True
     return self._init_op
 
+  def _create_iterator(self, eager_warmup):
+    ds_variant = _VARIANT_GETTER(self._dataset)
+    with ops.colocate_with(ds_variant):
+      return gen_pop_datastream_ops.ipu_create_dataset_iterator(
+          input_dataset=ds_variant,
+          feed_id=self._id,
+          replication_factor=self._replication_factor,
+          device_ordinal=self._device_ordinal,
+          eager_warmup=eager_warmup,
+          use_pinned_host_memory=self._use_pinned_host_memory,
+          **self._dataset._flat_structure)  # pylint: disable=protected-access
+
   @property
   def deleter(self):
     """A `tf.Operation` that can be run to delete the resources owned
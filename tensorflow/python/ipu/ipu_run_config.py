@@ -24,7 +24,8 @@ from tensorflow.python.estimator import run_config as run_config_lib
 class IPURunConfig(
     collections.namedtuple('IPURunConfig', [
         'iterations_per_loop', 'ipu_options', 'compile_summary',
-        'num_replicas', 'num_shards', 'autosharding', 'ordinal'
+        'num_replicas', 'num_shards', 'autosharding', 'ordinal',
+        'prefetch_depth'
     ])):
   """IPU related configuration required by `IPUEstimator`.
 
@@ -42,6 +43,9 @@ class IPURunConfig(
       across `num_shards` devices
     ordinal: The IPU device ordinal to use.  For instance `0` corresponds
       to `/device:IPU:0`.
+    prefetch_depth: The number of batches the infeed may prefetch onto the IPU
+      datastream while the previous iterations are running. By default the
+      `IPUInfeedQueue` default is used.
   """
   def __new__(cls,
               iterations_per_loop=1,
@@ -50,7 +54,8 @@ class IPURunConfig(
               num_replicas=1,
               num_shards=1,
               autosharding=False,
-              ordinal=0):
+              ordinal=0,
+              prefetch_depth=None):
 
     num_devices = num_replicas * num_shards
     if num_devices > 1 and ipu_options is None:
@@ -84,7 +89,8 @@ class IPURunConfig(
                               num_replicas=num_replicas,
                               num_shards=num_shards,
                               autosharding=autosharding,
-                              ordinal=ordinal)
+                              ordinal=ordinal,
+                              prefetch_depth=prefetch_depth)
 
 
 class RunConfig(run_config_lib.RunConfig):
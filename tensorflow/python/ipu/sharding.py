@@ -17,6 +17,8 @@ Utility functions for sharding graphs
 ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 """
 
+import collections
+
 from tensorflow.core.framework import attr_value_pb2
 from tensorflow.python.framework import ops
 
@@ -47,16 +49,17 @@ def dependencies(roots):
     roots: The root operations from which to start.
 
   """
-  working = roots
+  working = collections.deque(roots)
   op_set = set()
-  while len(working) > 0:
-    o = working[0]
+  while working:
+    o = working.popleft()
     if type(o) is ops.Tensor:
       o = o.op
-    working = working[1:]
+    if o in op_set:
+      continue
     op_set.add(o)
-    working += [t.op for t in o.inputs if t.op not in op_set]
-    working += [c for c in o.control_inputs if c not in op_set]
+    working.extend(t.op for t in o.inputs if t.op not in op_set)
+    working.extend(c for c in o.control_inputs if c not in op_set)
   return op_set
 
 
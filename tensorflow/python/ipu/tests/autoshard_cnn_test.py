@@ -45,6 +45,20 @@ def get_single_while_op_body(g):
   return body.graph
 
 
+def _build_conv_model(x, y):
+  x = layers.Conv2D(8, 3, padding='same', name="conv1", use_bias=False)(x)
+  x = layers.Conv2D(8, 3, padding='same', name="conv2", use_bias=False)(x)
+  x = layers.Conv2D(8, 3, padding='same', name="conv3", use_bias=False)(x)
+  x = math_ops.reduce_max(x, axis=[1, 2])
+
+  cross_entropy = nn.softmax_cross_entropy_with_logits_v2(
+      logits=x, labels=array_ops.stop_gradient(y))
+  loss = math_ops.reduce_mean(cross_entropy)
+  optim = sharded_optimizer.ShardedOptimizer(gd.GradientDescentOptimizer(0.01))
+  train = optim.minimize(cross_entropy)
+  return loss, train
+
+
 class AutoshardTest(test_util.TensorFlowTestCase):
   @test_util.deprecated_graph_mode_only
   def testFrozenInference(self):
@@ -94,24 +108,8 @@ class AutoshardTest(test_util.TensorFlowTestCase):
   @test_util.deprecated_graph_mode_only
   def testSimpleXlaCompileTraining(self):
     def my_model(inp, lab):
-
-      x = inp
-      y = lab
-
-      x = layers.Conv2D(8, 3, padding='same', name="conv1", use_bias=False)(x)
-      x = layers.Conv2D(8, 3, padding='same', name="conv2", use_bias=False)(x)
-      x = layers.Conv2D(8, 3, padding='same', name="conv3", use_bias=False)(x)
-      x = math_ops.reduce_max(x, axis=[1, 2])
-
-      cross_entropy = nn.softmax_cross_entropy_with_logits_v2(
-          logits=x, labels=array_ops.stop_gradient(y))
-      loss = math_ops.reduce_mean(cross_entropy)
-      optim = sharded_optimizer.ShardedOptimizer(
-          gd.GradientDescentOptimizer(0.01))
-      train = optim.minimize(cross_entropy)
-
+      loss, train = _build_conv_model(inp, lab)
       ipu.autoshard.automatic_sharding(2, inp, loss)
-
       return [loss, train]
 
     with ops.device("cpu"):
@@ -129,26 +127,12 @@ class AutoshardTest(test_util.TensorFlowTestCase):
 
   @test_util.deprecated_graph_mode_only
   def testSimpleTraining(self):
-    def my_model(x, y):
-      x = layers.Conv2D(8, 3, padding='same', name="conv1", use_bias=False)(x)
-      x = layers.Conv2D(8, 3, padding='same', name="conv2", use_bias=False)(x)
-      x = layers.Conv2D(8, 3, padding='same', name="conv3", use_bias=False)(x)
-      x = math_ops.reduce_max(x, axis=[1, 2])
-
-      cross_entropy = nn.softmax_cross_entropy_with_logits_v2(
-          logits=x, labels=array_ops.stop_gradient(y))
-      loss = math_ops.reduce_mean(cross_entropy)
-      optim = sharded_optimizer.ShardedOptimizer(
-          gd.GradientDescentOptimizer(0.01))
-      train = optim.minimize(cross_entropy)
-      return [loss, train]
-
     with ops.device("cpu"):
       inp = array_ops.placeholder(np.float32, [1, 12, 12, 4], name="data")
       lab = array_ops.placeholder(np.float32, [1, 8], name="labl")
 
     with ipu.scopes.ipu_scope("/device:IPU:0"):
-      l, t = my_model(inp, lab)
+      l, t = _build_conv_model(inp, lab)
 
     ipu.autoshard.automatic_sharding(2, inp, l)
 
@@ -160,26 +144,12 @@ class AutoshardTest(test_util.TensorFlowTestCase):
 
   @test_util.deprecated_graph_mode_only
   def testSimpleTrainingWithEdgeFilter(self):
-    def my_model(x, y):
-      x = layers.Conv2D(8, 3, padding='same', name="conv1", use_bias=False)(x)
-      x = layers.Conv2D(8, 3, padding='same', name="conv2", use_bias=False)(x)
-      x = layers.Conv2D(8, 3, padding='same', name="conv3", use_bias=False)(x)
-      x = math_ops.reduce_max(x, axis=[1, 2])
-
-      cross_entropy = nn.softmax_cross_entropy_with_logits_v2(
-          logits=x, labels=array_ops.stop_gradient(y))
-      loss = math_ops.reduce_mean(cross_entropy)
-      optim = sharded_optimizer.ShardedOptimizer(
-          gd.GradientDescentOptimizer(0.01))
-      train = optim.minimize(cross_entropy)
-      return [loss, train]
-
     with ops.device("cpu"):
       inp = array_ops.placeholder(np.float32, [1, 12, 12, 4], name="data")
       lab = array_ops.placeholder(np.float32, [1, 8], name="labl")
 
     with ipu.scopes.ipu_scope("/device:IPU:0"):
-      l, t = my_model(inp, lab)
+      l, t = _build_conv_model(inp, lab)
 
     filt = lambda e: not (e[0] != 'conv2/Conv2D' and e[1] != 'conv3/Conv2D')
 
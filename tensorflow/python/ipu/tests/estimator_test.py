@@ -13,9 +13,10 @@
 # limitations under the License.
 # ==============================================================================
 
-import random
+import os
 import shutil
-import glob
+
+import numpy as np
 
 from tensorflow.python.ipu import summary_ops
 from tensorflow.python.ipu import utils
@@ -63,25 +64,33 @@ def model_fn(features, labels, mode):
                                     train_op=train)
 
 
-def input_fn():
+def create_input_data(rng):
+  num_rows = 16 * 4
+  rows = np.arange(num_rows)
+  types = rng.randint(0, 3, size=num_rows)
+
+  t_data = rng.random_sample((num_rows, 4)).astype(np.float32)
+  t_data[rows, types] += rng.uniform(1.0, 3.0, size=num_rows)
+  v_data = np.zeros((num_rows, 3), dtype=np.float32)
+  v_data[rows, types] = 1.0
+  return t_data, v_data
 
-  t_data = []
-  v_data = []
-  for _ in range(16 * 4):
-    type = random.randint(0, 2)
-    t = [random.random(), random.random(), random.random(), random.random()]
-    t[type] += random.uniform(1.0, 3.0)
-    v = [0, 0, 0]
-    v[type] = 1.0
-    t_data.append(t)
-    v_data.append(v)
 
-  dataset = dataset_ops.Dataset.from_tensor_slices((t_data, v_data))
-  dataset = dataset.batch(4)
-  return dataset
+def make_input_fn(t_data, v_data):
+  def input_fn():
+    dataset = dataset_ops.Dataset.from_tensor_slices((t_data, v_data))
+    dataset = dataset.batch(4)
+    return dataset
+
+  return input_fn
 
 
 class IpuEstimatorTest(test_util.TensorFlowTestCase):
+  @classmethod
+  def setUpClass(cls):
+    super(IpuEstimatorTest, cls).setUpClass()
+    cls._input_data = create_input_data(np.random.RandomState(0))
+
   def testTrain(self):
 
     shutil.rmtree("testlogs", True)
@@ -95,9 +104,11 @@ class IpuEstimatorTest(test_util.TensorFlowTestCase):
                                      config=run_cfg,
                                      model_dir="testlogs")
 
-    classifier.train(input_fn=input_fn, steps=16)
+    classifier.train(input_fn=make_input_fn(*self._input_data), steps=16)
 
-    event_file = glob.glob("testlogs/event*")
+    event_file = [
+        e.path for e in os.scandir("testlogs") if e.name.startswith("event")
+    ]
 
     self.assertTrue(len(event_file) == 1)
 
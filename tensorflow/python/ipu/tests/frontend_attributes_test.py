@@ -31,15 +31,26 @@ from tensorflow.python.ops import variable_scope
 from tensorflow.python.ops import init_ops
 from tensorflow.python.platform import googletest
 
+_SR_ATTR = backend_config_pb2.FrontendAttributeId.Name(
+    backend_config_pb2.FrontendAttributeId.STOCHASTIC_ROUNDING)
+_SR_ON = backend_config_pb2.ThreeState.Name(backend_config_pb2.THREESTATE_ON)
+_SR_OFF = backend_config_pb2.ThreeState.Name(backend_config_pb2.THREESTATE_OFF)
+_SR_UNDEFINED = backend_config_pb2.ThreeState.Name(
+    backend_config_pb2.THREESTATE_UNDEFINED)
+
 
 def _getFrontendAttributes(op):
   try:
-    attributes = xla_data_pb2.FrontendAttributes()
-    attributes.ParseFromString(op.get_attr(
-        ipu.scopes.FRONTEND_ATTRIBUTES_NAME))
-    return attributes
+    serialized = op.get_attr(ipu.scopes.FRONTEND_ATTRIBUTES_NAME)
   except ValueError:
     return None
+  attributes = xla_data_pb2.FrontendAttributes()
+  attributes.ParseFromString(serialized)
+  return attributes
+
+
+def _createFloatOutput(graph, name):
+  return graph.create_op("FloatOutput", [], [dtypes.float32], name=name)
 
 
 def _createInputs(dimensions, dtype):
@@ -55,32 +66,24 @@ def _createFeeders(inputs, dimensions, dtype):
 class FrontendAttributesTest(test_util.TensorFlowTestCase):
   @test_util.deprecated_graph_mode_only
   def testSimpleSingleAttribute(self):
+    g = ops.get_default_graph()
     with ops.device("/device:IPU:0"):
-      op1 = ops.get_default_graph().create_op("FloatOutput", [],
-                                              [dtypes.float32],
-                                              name="myop1")
+      op1 = _createFloatOutput(g, "myop1")
       with ipu.scopes.frontend_attribute("attr_a", "a"):
-        op2 = ops.get_default_graph().create_op("FloatOutput", [],
-                                                [dtypes.float32],
-                                                name="myop2")
+        op2 = _createFloatOutput(g, "myop2")
         attributes2 = _getFrontendAttributes(op2)
         self.assertIsNone(_getFrontendAttributes(op1))
         self.assertEqual(attributes2.map.get("attr_a"), "a")
 
   @test_util.deprecated_graph_mode_only
   def testSimpleMultipleAttributes(self):
+    g = ops.get_default_graph()
     with ops.device("/device:IPU:0"):
-      op1 = ops.get_default_graph().create_op("FloatOutput", [],
-                                              [dtypes.float32],
-                                              name="myop1")
+      op1 = _createFloatOutput(g, "myop1")
       with ipu.scopes.frontend_attribute("attr_a", "a"):
-        op2 = ops.get_default_graph().create_op("FloatOutput", [],
-                                                [dtypes.float32],
-                                                name="myop2")
+        op2 = _createFloatOutput(g, "myop2")
         with ipu.scopes.frontend_attribute("attr_b", "b"):
-          op3 = ops.get_default_graph().create_op("FloatOutput", [],
-                                                  [dtypes.float32],
-                                                  name="myop3")
+          op3 = _createFloatOutput(g, "myop3")
           attributes2 = _getFrontendAttributes(op2)
           attributes3 = _getFrontendAttributes(op3)
           self.assertIsNone(_getFrontendAttributes(op1))
@@ -91,25 +94,18 @@ class FrontendAttributesTest(test_util.TensorFlowTestCase):
 
   @test_util.deprecated_graph_mode_only
   def testSingleAttributeWithScopes(self):
+    g = ops.get_default_graph()
     op1 = None
     op2 = None
     op3 = None
     op4 = None
     with ops.device("/device:IPU:0"):
       with ipu.scopes.frontend_attribute("attr_a", "a"):
-        op1 = ops.get_default_graph().create_op("FloatOutput", [],
-                                                [dtypes.float32],
-                                                name="myop1")
+        op1 = _createFloatOutput(g, "myop1")
         with ipu.scopes.frontend_attribute("attr_a", "c"):
-          op2 = ops.get_default_graph().create_op("FloatOutput", [],
-                                                  [dtypes.float32],
-                                                  name="myop2")
-        op3 = ops.get_default_graph().create_op("FloatOutput", [],
-                                                [dtypes.float32],
-                                                name="myop3")
-      op4 = ops.get_default_graph().create_op("FloatOutput", [],
-                                              [dtypes.float32],
-                                              name="myop4")
+          op2 = _createFloatOutput(g, "myop2")
+        op3 = _createFloatOutput(g, "myop3")
+      op4 = _createFloatOutput(g, "myop4")
       attributes1 = _getFrontendAttributes(op1)
       attributes2 = _getFrontendAttributes(op2)
       attributes3 = _getFrontendAttributes(op3)
@@ -120,26 +116,19 @@ class FrontendAttributesTest(test_util.TensorFlowTestCase):
 
   @test_util.deprecated_graph_mode_only
   def testMultipleAttributesWithScopes(self):
+    g = ops.get_default_graph()
     op1 = None
     op2 = None
     op3 = None
     op4 = None
     with ops.device("/device:IPU:0"):
       with ipu.scopes.frontend_attribute("attr_a", "a"):
-        op1 = ops.get_default_graph().create_op("FloatOutput", [],
-                                                [dtypes.float32],
-                                                name="myop1")
+        op1 = _createFloatOutput(g, "myop1")
         with ipu.scopes.frontend_attribute("attr_a", "c"):
           with ipu.scopes.frontend_attribute("attr_b", "b"):
-            op2 = ops.get_default_graph().create_op("FloatOutput", [],
-                                                    [dtypes.float32],
-                                                    name="myop2")
-        op3 = ops.get_default_graph().create_op("FloatOutput", [],
-                                                [dtypes.float32],
-                                                name="myop3")
-      op4 = ops.get_default_graph().create_op("FloatOutput", [],
-                                              [dtypes.float32],
-                                              name="myop4")
+            op2 = _createFloatOutput(g, "myop2")
+        op3 = _createFloatOutput(g, "myop3")
+      op4 = _createFloatOutput(g, "myop4")
       attributes1 = _getFrontendAttributes(op1)
       attributes2 = _getFrontendAttributes(op2)
       attributes3 = _getFrontendAttributes(op3)
@@ -153,6 +142,7 @@ class FrontendAttributesTest(test_util.TensorFlowTestCase):
 
   @test_util.deprecated_graph_mode_only
   def testStochasticRounding(self):
+    g = ops.get_default_graph()
     op1 = None
     op2 = None
     op3 = None
@@ -161,61 +151,27 @@ class FrontendAttributesTest(test_util.TensorFlowTestCase):
     with ops.device("/device:IPU:0"):
       with ipu.scopes.stochastic_rounding(False):
         with ipu.scopes.stochastic_rounding(True):
-          op1 = ops.get_default_graph().create_op("FloatOutput", [],
-                                                  [dtypes.float32],
-                                                  name="myop1")
+          op1 = _createFloatOutput(g, "myop1")
           with ipu.scopes.stochastic_rounding(False):
             with ipu.scopes.frontend_attribute("attr_b", "b"):
-              op2 = ops.get_default_graph().create_op("FloatOutput", [],
-                                                      [dtypes.float32],
-                                                      name="myop2")
-          op3 = ops.get_default_graph().create_op("FloatOutput", [],
-                                                  [dtypes.float32],
-                                                  name="myop3")
-        op4 = ops.get_default_graph().create_op("FloatOutput", [],
-                                                [dtypes.float32],
-                                                name="myop4")
-      op5 = ops.get_default_graph().create_op("FloatOutput", [],
-                                              [dtypes.float32],
-                                              name="myop5")
+              op2 = _createFloatOutput(g, "myop2")
+          op3 = _createFloatOutput(g, "myop3")
+        op4 = _createFloatOutput(g, "myop4")
+      op5 = _createFloatOutput(g, "myop5")
       attributes1 = _getFrontendAttributes(op1)
       attributes2 = _getFrontendAttributes(op2)
       attributes3 = _getFrontendAttributes(op3)
       attributes4 = _getFrontendAttributes(op4)
       attributes5 = _getFrontendAttributes(op5)
-      self.assertEqual(
-          attributes1.map.get(
-              backend_config_pb2.FrontendAttributeId.Name(
-                  backend_config_pb2.FrontendAttributeId.STOCHASTIC_ROUNDING)),
-          backend_config_pb2.ThreeState.Name(backend_config_pb2.THREESTATE_ON))
+      self.assertEqual(attributes1.map.get(_SR_ATTR), _SR_ON)
       self.assertIsNone(attributes1.map.get("attr_b"))
-      self.assertEqual(
-          attributes2.map.get(
-              backend_config_pb2.FrontendAttributeId.Name(
-                  backend_config_pb2.FrontendAttributeId.STOCHASTIC_ROUNDING)),
-          backend_config_pb2.ThreeState.Name(
-              backend_config_pb2.THREESTATE_OFF))
+      self.assertEqual(attributes2.map.get(_SR_ATTR), _SR_OFF)
       self.assertEqual(attributes2.map.get("attr_b"), "b")
-      self.assertEqual(
-          attributes3.map.get(
-              backend_config_pb2.FrontendAttributeId.Name(
-                  backend_config_pb2.FrontendAttributeId.STOCHASTIC_ROUNDING)),
-          backend_config_pb2.ThreeState.Name(backend_config_pb2.THREESTATE_ON))
+      self.assertEqual(attributes3.map.get(_SR_ATTR), _SR_ON)
       self.assertIsNone(attributes3.map.get("attr_b"))
-      self.assertEqual(
-          attributes4.map.get(
-              backend_config_pb2.FrontendAttributeId.Name(
-                  backend_config_pb2.FrontendAttributeId.STOCHASTIC_ROUNDING)),
-          backend_config_pb2.ThreeState.Name(
-              backend_config_pb2.THREESTATE_OFF))
-
+      self.assertEqual(attributes4.map.get(_SR_ATTR), _SR_OFF)
       self.assertIsNone(attributes4.map.get("attr_b"))
-      self.assertEqual(
-          attributes5.map.get(
-              backend_config_pb2.FrontendAttributeId.Name(
-                  backend_config_pb2.FrontendAttributeId.STOCHASTIC_ROUNDING)),
-          backend_config_pb2.ThreeState.Name(
-              backend_config_pb2.THREESTATE_UNDEFINED))
+      self.assertEqual(attributes5.map.get(_SR_ATTR), _SR_UNDEFINED)
       self.assertIsNone(attributes5.map.get("attr_b"))
 
   @test_util.deprecated_graph_mode_only
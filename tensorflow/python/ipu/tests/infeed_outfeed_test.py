@@ -45,6 +45,18 @@ def next_feed_id():
 next_feed_id.feed_count = 0
 
 
+def _prefetch_datasets(dataset):
+  """Returns the `PrefetchDataset`s in the input pipeline of `dataset`."""
+  found = []
+  pending = [dataset]
+  while pending:
+    d = pending.pop()
+    if isinstance(d, dataset_ops.PrefetchDataset):
+      found.append(d)
+    pending.extend(d._inputs())  # pylint: disable=protected-access
+  return found
+
+
 class InfeedOutfeedTest(test_util.TensorFlowTestCase):
   @test_util.deprecated_graph_mode_only
   def testSingleInfeedRepeatNonTuple(self):
@@ -72,6 +84,125 @@ class InfeedOutfeedTest(test_util.TensorFlowTestCase):
       result = sess.run(res, {v: np.ones([4, 4], np.float32)})
       self.assertAllClose(result[0], np.broadcast_to(91, [4, 4]))
 
+  @test_util.deprecated_graph_mode_only
+  def testSingleInfeedRepeatNonTupleEagerWarmup(self):
+    dataset = tu.create_single_increasing_dataset(10, shape=[4, 4])
+
+    infeed_queue = ipu.ipu_infeed_queue.IPUInfeedQueue(dataset,
+                                                       next_feed_id(),
+                                                       eager_warmup=True)
+
+    def body(v, x):
+      v = v + x
+      return v
+
+    def my_net(v):
+      r = ipu.loops.repeat(20, body, (v), infeed_queue)
+      return r
+
+    with ops.device('cpu'):
+      v = array_ops.placeholder(np.float32, [4, 4])
+
+    with ipu.scopes.ipu_scope("/device:IPU:0"):
+      res = ipu.ipu_compiler.compile(my_net, inputs=[v])
+
+    with session_lib.Session() as sess:
+      tu.ReportJSON(self, sess)
+      sess.run(infeed_queue.initializer)
+      result = sess.run(res, {v: np.ones([4, 4], np.float32)})
+      # The element fetched by the warm up must not be skipped.
+      self.assertAllClose(result[0], np.broadcast_to(91, [4, 4]))
+
+  @test_util.deprecated_graph_mode_only
+  def testSingleInfeedRepeatNonTuplePinnedHostMemory(self):
+    dataset = tu.create_single_increasing_dataset(10, shape=[4, 4])
+
+    infeed_queue = ipu.ipu_infeed_queue.IPUInfeedQueue(
+        dataset, next_feed_id(), use_pinned_host_memory=True)
+
+    def body(v, x):
+      v = v + x
+      return v
+
+    def my_net(v):
+      r = ipu.loops.repeat(20, body, (v), infeed_queue)
+      return r
+
+    with ops.device('cpu'):
+      v = array_ops.placeholder(np.float32, [4, 4])
+
+    with ipu.scopes.ipu_scope("/device:IPU:0"):
+      res = ipu.ipu_compiler.compile(my_net, inputs=[v])
+
+    with session_lib.Session() as sess:
+      tu.ReportJSON(self, sess)
+      sess.run(infeed_queue.initializer)
+      result = sess.run(res, {v: np.ones([4, 4], np.float32)})
+      self.assertAllClose(result[0], np.broadcast_to(91, [4, 4]))
+
+  @test_util.deprecated_graph_mode_only
+  def testSingleInfeedRepeatNonTuplePrefetchBufferSize(self):
+    dataset = tu.create_single_increasing_dataset(10, shape=[4, 4])
+
+    infeed_queue = ipu.ipu_infeed_queue.IPUInfeedQueue(dataset,
+                                                       next_feed_id(),
+                                                       prefetch_buffer_size=2)
+
+    def body(v, x):
+      v = v + x
+      return v
+
+    def my_net(v):
+      r = ipu.loops.repeat(20, body, (v), infeed_queue)
+      return r
+
+    with ops.device('cpu'):
+      v = array_ops.placeholder(np.float32, [4, 4])
+
+    with ipu.scopes.ipu_scope("/device:IPU:0"):
+      res = ipu.ipu_compiler.compile(my_net, inputs=[v])
+
+    with session_lib.Session() as sess:
+      tu.ReportJSON(self, sess)
+      sess.run(infeed_queue.initializer)
+      result = sess.run(res, {v: np.ones([4, 4], np.float32)})
+      self.assertAllClose(result[0], np.broadcast_to(91, [4, 4]))
+
+  @test_util.deprecated_graph_mode_only
+  def testSingleInfeedRepeatNonTupleCoalesced(self):
+    dataset = tu.create_single_increasing_dataset(10, shape=[4, 4])
+
+    with self.assertRaisesRegex(ValueError, 'cannot both be set'):
+      ipu.ipu_infeed_queue.IPUInfeedQueue(dataset,
+                                          next_feed_id(),
+                                          data_to_prefetch=2,
+                                          coalesce_bytes=256)
+
+    # Each element is 64 bytes, so four elements are transferred at a time.
+    infeed_queue = ipu.ipu_infeed_queue.IPUInfeedQueue(dataset,
+                                                       next_feed_id(),
+                                                       coalesce_bytes=256)
+
+    def body(v, x):
+      v = v + x
+      return v
+
+    def my_net(v):
+      r = ipu.loops.repeat(20, body, (v), infeed_queue)
+      return r
+
+    with ops.device('cpu'):
+      v = array_ops.placeholder(np.float32, [4, 4])
+
+    with ipu.scopes.ipu_scope("/device:IPU:0"):
+      res = ipu.ipu_compiler.compile(my_net, inputs=[v])
+
+    with session_lib.Session() as sess:
+      tu.ReportJSON(self, sess)
+      sess.run(infeed_queue.initializer)
+      result = sess.run(res, {v: np.ones([4, 4], np.float32)})
+      self.assertAllClose(result[0], np.broadcast_to(91, [4, 4]))
+
   @test_util.deprecated_graph_mode_only
   def testSingleInfeedRepeatNonTupleFiniteDataset(self):
     dataset = tu.create_single_increasing_dataset(10,
@@ -366,6 +497,39 @@ class InfeedOutfeedTest(test_util.TensorFlowTestCase):
     with self.assertRaisesRegex(ValueError, r'Output shape \((\?|None),'):
       ipu.ipu_infeed_queue.IPUInfeedQueue(dataset, next_feed_id())
 
+  @test_util.deprecated_graph_mode_only
+  def testDefaultOptimizationOptions(self):
+    dataset = tu.create_single_increasing_dataset(10, shape=[4, 4])
+    options = dataset_ops.Options()
+    options.experimental_optimization.map_fusion = False
+    dataset = dataset.with_options(options)
+    infeed_queue = ipu.ipu_infeed_queue.IPUInfeedQueue(dataset, next_feed_id())
+    optimization = infeed_queue._dataset.options().experimental_optimization  # pylint: disable=protected-access
+    self.assertFalse(optimization.map_fusion)
+    self.assertTrue(optimization.map_and_batch_fusion)
+    self.assertIsNone(optimization.map_vectorization.enabled)
+
+  @test_util.deprecated_graph_mode_only
+  def testPrefetchBufferSize(self):
+    def make_dataset():
+      return dataset_ops.Dataset.from_tensors(np.ones([4, 4],
+                                                      np.float32)).repeat()
+
+    # No prefetching is added by default or when it is disabled.
+    for prefetch_buffer_size in [None, 0]:
+      infeed_queue = ipu.ipu_infeed_queue.IPUInfeedQueue(
+          make_dataset(),
+          next_feed_id(),
+          prefetch_buffer_size=prefetch_buffer_size)
+      self.assertFalse(_prefetch_datasets(infeed_queue._dataset))  # pylint: disable=protected-access
+
+    infeed_queue = ipu.ipu_infeed_queue.IPUInfeedQueue(make_dataset(),
+                                                       next_feed_id(),
+                                                       prefetch_buffer_size=3)
+    prefetches = _prefetch_datasets(infeed_queue._dataset)  # pylint: disable=protected-access
+    self.assertEqual(len(prefetches), 1)
+    self.assertEqual(self.evaluate(prefetches[0]._buffer_size), 3)  # pylint: disable=protected-access
+
   @test_util.deprecated_graph_mode_only
   def testMultipleInitializations(self):
     dataset = tu.create_single_increasing_dataset(10, shape=[4, 4])
@@ -13,10 +13,13 @@
 # limitations under the License.
 # =============================================================================
 
-import glob
+import functools
+import os
+import struct
 import numpy as np
 
 from tensorflow.compiler.plugin.poplar.tests import test_utils as tu
+from tensorflow.core.util import event_pb2
 from tensorflow.keras import layers
 from tensorflow.python import ipu
 from tensorflow.python import ops
@@ -36,7 +39,6 @@ from tensorflow.python.ops import metrics_impl
 from tensorflow.python.ops import variable_scope
 from tensorflow.python.ops.losses import losses
 from tensorflow.python.platform import googletest
-from tensorflow.python.summary import summary_iterator
 from tensorflow.python.training import gradient_descent
 from tensorflow.python.training import session_run_hook
 
@@ -45,14 +47,52 @@ def _dummy_model_fn(features, labels, params):
   _, _, _ = features, labels, params
 
 
+@functools.lru_cache(maxsize=None)
 def _create_regression_dataset(num_samples, num_features):
-  np.random.seed(1234)
-  target_weights = np.random.rand(num_features, 1).astype(np.float32)
-  X = np.random.rand(num_samples, num_features).astype(np.float32)
-  y = np.matmul(X, target_weights)
+  if hasattr(np.random, "default_rng"):
+    # Sample directly in float32 where the Generator API is available.
+    rng = np.random.default_rng(1234)
+    target_weights = rng.random((num_features, 1), dtype=np.float32)
+    X = rng.random((num_samples, num_features), dtype=np.float32)
+  else:
+    np.random.seed(1234)
+    target_weights = np.random.rand(num_features, 1).astype(np.float32)
+    X = np.random.rand(num_samples, num_features).astype(np.float32)
+  y = np.empty((num_samples, 1), dtype=np.float32)
+  np.matmul(X, target_weights, out=y)
   return X, y
 
 
+def _iter_tfrecords(data):
+  """Yields the payloads of the TFRecord frames in `data`. Each frame is a
+  little-endian uint64 length and its CRC, the payload, and the payload CRC.
+  A truncated last frame, which the writer may still be flushing, is
+  ignored."""
+  offset = 0
+  while offset + 12 <= len(data):
+    length, = struct.unpack_from("<Q", data, offset)
+    if offset + 12 + length + 4 > len(data):
+      return
+    offset += 12
+    yield data[offset:offset + length]
+    offset += length + 4
+
+
+def _find_events_file(model_dir):
+  events_files = [e.path for e in os.scandir(model_dir) if "tfevents" in e.name]
+  assert len(events_files) == 1
+  return events_files[0]
+
+
+def _read_losses(events_file):
+  with open(events_file, "rb") as f:
+    data = f.read()
+  return np.fromiter((v.simple_value for record in _iter_tfrecords(data)
+                      for v in event_pb2.Event.FromString(record).summary.value
+                      if v.tag == "loss"),
+                     dtype=np.float32)
+
+
 class _SessionRunCounter(session_run_hook.SessionRunHook):
   def __init__(self):
     self.num_session_runs = 0
@@ -62,6 +102,19 @@ class _SessionRunCounter(session_run_hook.SessionRunHook):
 
 
 class IPUEstimatorReplicatedTest(test_util.TensorFlowTestCase):
+  @classmethod
+  def setUpClass(cls):
+    super(IPUEstimatorReplicatedTest, cls).setUpClass()
+    cls._ipu_options_4 = ipu_utils.auto_select_ipus(
+        ipu_utils.create_ipu_config(), 4)
+    # Shared by the tests that run a single step on four replicas. Each
+    # estimator still gets its own model directory.
+    cls._replicated_config_4 = ipu_run_config.RunConfig(
+        ipu_run_config=ipu_run_config.IPURunConfig(
+            iterations_per_loop=1,
+            num_replicas=4,
+            ipu_options=cls._ipu_options_4))
+
   @test_util.deprecated_graph_mode_only
   def testTrainReplicated(self):
     if ipu_utils.running_on_ipu_model():
@@ -86,12 +139,14 @@ class IPUEstimatorReplicatedTest(test_util.TensorFlowTestCase):
       dataset = dataset.batch(batch_size=1, drop_remainder=True)
       return dataset
 
-    ipu_options = ipu_utils.create_ipu_config()
-    ipu_options = ipu_utils.auto_select_ipus(ipu_options, 4)
+    # Two loops, so the infeed has to carry on across a loop boundary.
+    num_steps = 6
     config = ipu_run_config.RunConfig(
-        ipu_run_config=ipu_run_config.IPURunConfig(iterations_per_loop=2,
-                                                   num_replicas=4,
-                                                   ipu_options=ipu_options),
+        ipu_run_config=ipu_run_config.IPURunConfig(
+            iterations_per_loop=num_steps // 2,
+            num_replicas=4,
+            prefetch_depth=2,
+            ipu_options=self._ipu_options_4),
         log_step_count_steps=1,
         save_summary_steps=1)
 
@@ -99,7 +154,6 @@ class IPUEstimatorReplicatedTest(test_util.TensorFlowTestCase):
 
     session_run_counter = _SessionRunCounter()
 
-    num_steps = 6
     estimator.train(input_fn=my_input_fn,
                     steps=num_steps,
                     hooks=[session_run_counter])
@@ -107,18 +161,12 @@ class IPUEstimatorReplicatedTest(test_util.TensorFlowTestCase):
     self.assertEqual(session_run_counter.num_session_runs,
                      num_steps // config.ipu_run_config.iterations_per_loop)
 
-    model_dir = estimator.model_dir
-    events_file = glob.glob(model_dir + "/*tfevents*")
-    assert len(events_file) == 1
-    events_file = events_file[0]
-    loss_output = list()
-    for e in summary_iterator.summary_iterator(events_file):
-      for v in e.summary.value:
-        if "loss" in v.tag:
-          loss_output.append(v.simple_value)
+    loss_output = _read_losses(_find_events_file(estimator.model_dir))
 
-    # loss is averaged across iterations per loop
-    self.assertEqual(loss_output, [14.0, 16.0, 18.0])
+    # The four replicas take consecutive elements of the repeating dataset
+    # 0..9, so the summed losses of the steps are 6, 22, 18, 14, 30 and 6.
+    # The loss is averaged across the iterations of each loop.
+    self.assertAllClose(loss_output, [46.0 / 3, 50.0 / 3])
 
   @test_util.deprecated_graph_mode_only
   def testTrainReplicatedOnRegressionDataset(self):
@@ -146,16 +194,18 @@ class IPUEstimatorReplicatedTest(test_util.TensorFlowTestCase):
 
     def my_input_fn():
       dataset = dataset_ops.Dataset.from_tensor_slices(
-          _create_regression_dataset(num_samples=1000, num_features=5))
-      dataset = dataset.batch(batch_size=2, drop_remainder=True).repeat()
+          _create_regression_dataset(num_samples=32, num_features=5))
+      dataset = dataset.repeat().batch(batch_size=2, drop_remainder=True)
       return dataset
 
-    ipu_options = ipu_utils.create_ipu_config()
-    ipu_options = ipu_utils.auto_select_ipus(ipu_options, 4)
+    # Two loops are enough to see the loss decrease.
+    num_steps = 6
     config = ipu_run_config.RunConfig(
-        ipu_run_config=ipu_run_config.IPURunConfig(iterations_per_loop=2,
-                                                   num_replicas=4,
-                                                   ipu_options=ipu_options),
+        ipu_run_config=ipu_run_config.IPURunConfig(
+            iterations_per_loop=num_steps // 2,
+            num_replicas=4,
+            prefetch_depth=2,
+            ipu_options=self._ipu_options_4),
         log_step_count_steps=1,
         save_summary_steps=1)
 
@@ -163,7 +213,6 @@ class IPUEstimatorReplicatedTest(test_util.TensorFlowTestCase):
 
     session_run_counter = _SessionRunCounter()
 
-    num_steps = 6
     estimator.train(input_fn=my_input_fn,
                     steps=num_steps,
                     hooks=[session_run_counter])
@@ -171,15 +220,7 @@ class IPUEstimatorReplicatedTest(test_util.TensorFlowTestCase):
     self.assertEqual(session_run_counter.num_session_runs,
                      num_steps // config.ipu_run_config.iterations_per_loop)
 
-    model_dir = estimator.model_dir
-    events_file = glob.glob(model_dir + "/*tfevents*")
-    assert len(events_file) == 1
-    events_file = events_file[0]
-    loss_output = list()
-    for e in summary_iterator.summary_iterator(events_file):
-      for v in e.summary.value:
-        if "loss" in v.tag:
-          loss_output.append(v.simple_value)
+    loss_output = _read_losses(_find_events_file(estimator.model_dir))
 
     self.assertTrue(loss_output[0] > loss_output[-1])
 
@@ -213,17 +254,19 @@ class IPUEstimatorReplicatedTest(test_util.TensorFlowTestCase):
 
     def my_input_fn():
       dataset = dataset_ops.Dataset.from_tensor_slices(
-          _create_regression_dataset(num_samples=1000, num_features=5))
-      dataset = dataset.batch(batch_size=2, drop_remainder=True).repeat()
+          _create_regression_dataset(num_samples=32, num_features=5))
+      dataset = dataset.repeat().batch(batch_size=2, drop_remainder=True)
       return dataset
 
-    ipu_options = ipu_utils.create_ipu_config()
-    ipu_options = ipu_utils.auto_select_ipus(ipu_options, 4)
+    # Two loops are enough to see the loss decrease.
+    num_steps = 10
     config = ipu_run_config.RunConfig(
-        ipu_run_config=ipu_run_config.IPURunConfig(iterations_per_loop=2,
-                                                   num_replicas=2,
-                                                   num_shards=2,
-                                                   ipu_options=ipu_options),
+        ipu_run_config=ipu_run_config.IPURunConfig(
+            iterations_per_loop=num_steps // 2,
+            num_replicas=2,
+            num_shards=2,
+            prefetch_depth=2,
+            ipu_options=self._ipu_options_4),
         log_step_count_steps=1,
         save_summary_steps=1)
 
@@ -231,7 +274,6 @@ class IPUEstimatorReplicatedTest(test_util.TensorFlowTestCase):
 
     session_run_counter = _SessionRunCounter()
 
-    num_steps = 10
     estimator.train(input_fn=my_input_fn,
                     steps=num_steps,
                     hooks=[session_run_counter])
@@ -239,15 +281,7 @@ class IPUEstimatorReplicatedTest(test_util.TensorFlowTestCase):
     self.assertEqual(session_run_counter.num_session_runs,
                      num_steps // config.ipu_run_config.iterations_per_loop)
 
-    model_dir = estimator.model_dir
-    events_file = glob.glob(model_dir + "/*tfevents*")
-    assert len(events_file) == 1
-    events_file = events_file[0]
-    loss_output = list()
-    for e in summary_iterator.summary_iterator(events_file):
-      for v in e.summary.value:
-        if "loss" in v.tag:
-          loss_output.append(v.simple_value)
+    loss_output = _read_losses(_find_events_file(estimator.model_dir))
 
     self.assertTrue(loss_output[0] > loss_output[-1])
 
@@ -282,13 +316,8 @@ class IPUEstimatorReplicatedTest(test_util.TensorFlowTestCase):
                                         loss=loss,
                                         eval_metric_ops=eval_metric_ops)
 
-    ipu_options = ipu_utils.create_ipu_config()
-    ipu_options = ipu_utils.auto_select_ipus(ipu_options, num_ipus=4)
-    config = ipu_run_config.RunConfig(
-        ipu_run_config=ipu_run_config.IPURunConfig(
-            iterations_per_loop=1, num_replicas=4, ipu_options=ipu_options))
-
-    estimator = ipu_estimator.IPUEstimator(model_fn=my_model_fn, config=config)
+    estimator = ipu_estimator.IPUEstimator(model_fn=my_model_fn,
+                                           config=self._replicated_config_4)
     scores = estimator.evaluate(my_input_fn, steps=1)
     self.assertEqual(3., scores["feature_mean"])
     self.assertEqual(4., scores[model_fn_lib.LOSS_METRIC_KEY])
@@ -323,13 +352,8 @@ class IPUEstimatorReplicatedTest(test_util.TensorFlowTestCase):
                                             loss=loss,
                                             eval_metrics=eval_metrics)
 
-    ipu_options = ipu_utils.create_ipu_config()
-    ipu_options = ipu_utils.auto_select_ipus(ipu_options, num_ipus=4)
-    config = ipu_run_config.RunConfig(
-        ipu_run_config=ipu_run_config.IPURunConfig(
-            iterations_per_loop=1, num_replicas=4, ipu_options=ipu_options))
-
-    estimator = ipu_estimator.IPUEstimator(model_fn=my_model_fn, config=config)
+    estimator = ipu_estimator.IPUEstimator(model_fn=my_model_fn,
+                                           config=self._replicated_config_4)
     scores = estimator.evaluate(my_input_fn, steps=1)
     self.assertEqual(0.75, scores["accuracy"])
     self.assertEqual(1.0, scores["precision"])
@@ -373,12 +397,8 @@ class IPUEstimatorReplicatedTest(test_util.TensorFlowTestCase):
           predictions=predictions,
       )
 
-    ipu_options = ipu_utils.create_ipu_config()
-    ipu_options = ipu_utils.auto_select_ipus(ipu_options, num_ipus=4)
-    config = ipu_run_config.RunConfig(
-        ipu_run_config=ipu_run_config.IPURunConfig(
-            iterations_per_loop=1, num_replicas=4, ipu_options=ipu_options))
-    estimator = ipu_estimator.IPUEstimator(model_fn=my_model_fn, config=config)
+    estimator = ipu_estimator.IPUEstimator(model_fn=my_model_fn,
+                                           config=self._replicated_config_4)
 
     outputs = estimator.predict(input_fn=my_input_fn,
                                 yield_single_examples=True)
@@ -413,18 +433,17 @@ class IPUEstimatorReplicatedTest(test_util.TensorFlowTestCase):
 
     def my_input_fn():
       dataset = dataset_ops.Dataset.from_tensor_slices(
-          _create_regression_dataset(num_samples=1000, num_features=5))
-      dataset = dataset.batch(batch_size=2, drop_remainder=True).repeat()
+          _create_regression_dataset(num_samples=32, num_features=5))
+      dataset = dataset.repeat().batch(batch_size=2, drop_remainder=True)
       return dataset
 
-    ipu_options = ipu_utils.create_ipu_config()
-    ipu_options = ipu_utils.auto_select_ipus(ipu_options, 4)
-
     config = ipu_run_config.RunConfig(
-        ipu_run_config=ipu_run_config.IPURunConfig(iterations_per_loop=2,
-                                                   num_shards=4,
-                                                   autosharding=True,
-                                                   ipu_options=ipu_options),
+        ipu_run_config=ipu_run_config.IPURunConfig(
+            iterations_per_loop=2,
+            num_shards=4,
+            autosharding=True,
+            prefetch_depth=2,
+            ipu_options=self._ipu_options_4),
         log_step_count_steps=1,
         save_summary_steps=1)
 
@@ -432,15 +451,7 @@ class IPUEstimatorReplicatedTest(test_util.TensorFlowTestCase):
 
     estimator.train(input_fn=my_input_fn, steps=10)
 
-    model_dir = estimator.model_dir
-    events_file = glob.glob(model_dir + "/*tfevents*")
-    assert len(events_file) == 1
-    events_file = events_file[0]
-    loss_output = list()
-    for e in summary_iterator.summary_iterator(events_file):
-      for v in e.summary.value:
-        if "loss" in v.tag:
-          loss_output.append(v.simple_value)
+    loss_output = _read_losses(_find_events_file(estimator.model_dir))
 
     self.assertTrue(loss_output[0] > loss_output[-1])
 
@@ -454,12 +465,8 @@ class IPUEstimatorReplicatedTest(test_util.TensorFlowTestCase):
       train_op = array_ops.identity(loss)
       return model_fn_lib.EstimatorSpec(mode, loss=loss, train_op=train_op)
 
-    ipu_options = ipu_utils.create_ipu_config()
-    ipu_options = ipu_utils.auto_select_ipus(ipu_options, num_ipus=4)
-    config = ipu_run_config.RunConfig(
-        ipu_run_config=ipu_run_config.IPURunConfig(
-            iterations_per_loop=1, num_replicas=4, ipu_options=ipu_options))
-    estimator = ipu_estimator.IPUEstimator(model_fn=my_model_fn, config=config)
+    estimator = ipu_estimator.IPUEstimator(model_fn=my_model_fn,
+                                           config=self._replicated_config_4)
 
     with self.assertRaisesRegex(
         ValueError, "This is not a valid replicated training graph"):
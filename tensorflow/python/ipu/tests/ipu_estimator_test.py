@@ -14,6 +14,7 @@
 # =============================================================================
 
 import glob
+import itertools
 import six
 import numpy as np
 
@@ -528,17 +529,20 @@ class IPUEstimatorTest(test_util.TensorFlowTestCase, parameterized.TestCase):
 
     event_file = glob.glob(estimator.model_dir + "/event*")
     self.assertTrue(len(event_file) == 1)
-    compile_for_ipu_count = 0
-    for summary in summary_iterator.summary_iterator(event_file[0]):
-      for val in summary.summary.value:
-        if val.tag == "ipu_trace":
-          for evt_str in val.tensor.string_val:
-            evt = IpuTraceEvent.FromString(evt_str)
 
-            if evt.type == IpuTraceEvent.COMPILE_END and \
-                evt.compile_end.compilation_report:
-              compile_for_ipu_count += 1
+    def compile_reports():
+      for summary in summary_iterator.summary_iterator(event_file[0]):
+        for val in summary.summary.value:
+          if val.tag == "ipu_trace":
+            for evt_str in val.tensor.string_val:
+              evt = IpuTraceEvent.FromString(evt_str)
 
+              if evt.type == IpuTraceEvent.COMPILE_END and \
+                  evt.compile_end.compilation_report:
+                yield evt
+
+    # Stop reading the event file as soon as a second compilation is found.
+    compile_for_ipu_count = len(list(itertools.islice(compile_reports(), 2)))
     self.assertEqual(compile_for_ipu_count, 1)
 
   def testEventDecode(self):
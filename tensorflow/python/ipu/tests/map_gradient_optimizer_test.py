@@ -22,7 +22,7 @@ from tensorflow.python.framework import ops
 from tensorflow.python.framework import test_util
 from tensorflow.python.keras import layers
 from tensorflow.python.ops import array_ops
-from tensorflow.python.ops import clip_ops
+from tensorflow.python.ops import gen_math_ops
 from tensorflow.python.ops import math_ops
 from tensorflow.python.ops import nn_ops as nn
 from tensorflow.python.platform import googletest
@@ -41,11 +41,12 @@ def map_fn_quadratic(grad, var):
 
 
 def map_fn_clipping_7_and_14(grad, var):
-  return clip_ops.clip_by_value(grad, 7, 14, name=None)
+  return gen_math_ops.clip_by_value(grad, 7.0, 14.0)
 
 
 def map_fn_decay(grad, var):
-  return grad + (WEIGHT_DECAY * var)
+  decay = constant_op.constant(WEIGHT_DECAY, dtype=dtypes.float32)
+  return math_ops.add(grad, math_ops.multiply(var, decay))
 
 
 class MapGradientOptimizerTest(test_util.TensorFlowTestCase):
@@ -53,6 +54,7 @@ class MapGradientOptimizerTest(test_util.TensorFlowTestCase):
   def testMapGradientOptimizer(self):
     # test with map_fn_quadratic(), x + y + z
     with self.cached_session():
+      # Separate variables, so that the map is applied to each of them.
       optimizer = gd.GradientDescentOptimizer(3.0)
       values = [1.0, 2.0, 3.0]
       vars_ = [variables.Variable([v], dtype=dtypes.float32) for v in values]
@@ -60,126 +62,104 @@ class MapGradientOptimizerTest(test_util.TensorFlowTestCase):
           optimizer, map_fn_quadratic)
       grads_and_vars = map_optimizer.compute_gradients(
           vars_[0] + vars_[1] + vars_[2], vars_)
+      train_op = map_optimizer.apply_gradients(grads_and_vars)
 
       variables.global_variables_initializer().run()
-      expect_grads = ([1], [1], [1])
-      index = 0
-      for grad, _ in grads_and_vars:
-        self.assertAllCloseAccordingToType(expect_grads[index],
-                                           self.evaluate(grad))
-        index += 1
+      expect_grads = np.array([[1.], [1.], [1.]], dtype=np.float32)
+      grads = np.stack(self.evaluate([grad for grad, _ in grads_and_vars]))
+      self.assertAllCloseAccordingToType(expect_grads, grads)
+
+      train_op.run()
+      expect_weights = np.array([[-2.], [-1.], [0.]], dtype=np.float32)
+      self.assertAllCloseAccordingToType(expect_weights,
+                                         np.stack(self.evaluate(vars_)))
 
   @test_util.deprecated_graph_mode_only
   def testMapGradientDecentWithSquare(self):
     # test with map_fn_quadratic(), x^2 + y + z
     with self.cached_session():
       optimizer = gd.GradientDescentOptimizer(3.0)
-      values = [1.0, 1.0, 1.0]
-      vars_ = [variables.Variable([v], dtype=dtypes.float32) for v in values]
+      var = variables.Variable([1.0, 1.0, 1.0], dtype=dtypes.float32)
       map_optimizer = map_gradient_optimizer.MapGradientOptimizer(
           optimizer, map_fn_quadratic)
       grads_and_vars = map_optimizer.compute_gradients(
-          vars_[0] * vars_[0] + vars_[1] + vars_[2], vars_)
+          var[0] * var[0] + var[1] + var[2], [var])
 
       variables.global_variables_initializer().run()
-      expect_grads = ([4], [1], [1])
-      index = 0
-      for grad, _ in grads_and_vars:
-        self.assertAllCloseAccordingToType(expect_grads[index],
-                                           self.evaluate(grad))
-        index += 1
+      expect_grads = np.array([4., 1., 1.], dtype=np.float32)
+      grad, _ = grads_and_vars[0]
+      self.assertAllCloseAccordingToType(expect_grads, self.evaluate(grad))
 
   @test_util.deprecated_graph_mode_only
   def testMapGrandientDescentWithSquare2(self):
     #test with map_fn_quadratic(), x*y + x*z + y*z
     with self.cached_session():
       optimizer = gd.GradientDescentOptimizer(3.0)
-      values = [1.0, 2.0, 3.0]
-      vars_ = [variables.Variable([v], dtype=dtypes.float32) for v in values]
+      var = variables.Variable([1.0, 2.0, 3.0], dtype=dtypes.float32)
       map_optimizer = map_gradient_optimizer.MapGradientOptimizer(
           optimizer, map_fn_quadratic)
       grads_and_vars = map_optimizer.compute_gradients(
-          vars_[0] * vars_[1] + vars_[0] * vars_[2] + vars_[1] * vars_[2],
-          vars_)
+          var[0] * var[1] + var[0] * var[2] + var[1] * var[2], [var])
 
       variables.global_variables_initializer().run()
-      expect_grads = ([25], [16], [9])
-      index = 0
-      for grad, _ in grads_and_vars:
-        self.assertAllCloseAccordingToType(expect_grads[index],
-                                           self.evaluate(grad))
-        index += 1
+      expect_grads = np.array([25., 16., 9.], dtype=np.float32)
+      grad, _ = grads_and_vars[0]
+      self.assertAllCloseAccordingToType(expect_grads, self.evaluate(grad))
 
   @test_util.deprecated_graph_mode_only
   def testLambda(self):
     #test with lambda, x*y + x*z + y*z
     with self.cached_session():
       optimizer = gd.GradientDescentOptimizer(3.0)
-      values = [1.0, 2.0, 3.0]
-      vars_ = [variables.Variable([v], dtype=dtypes.float32) for v in values]
+      var = variables.Variable([1.0, 2.0, 3.0], dtype=dtypes.float32)
       map_optimizer = map_gradient_optimizer.MapGradientOptimizer(
           optimizer, lambda grad_lamb, var_lamb: math_ops.square(grad_lamb))
       grads_and_vars = map_optimizer.compute_gradients(
-          vars_[0] * vars_[1] + vars_[0] * vars_[2] + vars_[1] * vars_[2],
-          vars_)
+          var[0] * var[1] + var[0] * var[2] + var[1] * var[2], [var])
 
       variables.global_variables_initializer().run()
-      expect_grads = ([25], [16], [9])
-      index = 0
-      for grad, _ in grads_and_vars:
-        self.assertAllCloseAccordingToType(expect_grads[index],
-                                           self.evaluate(grad))
-        index += 1
+      expect_grads = np.array([25., 16., 9.], dtype=np.float32)
+      grad, _ = grads_and_vars[0]
+      self.assertAllCloseAccordingToType(expect_grads, self.evaluate(grad))
 
   @test_util.deprecated_graph_mode_only
   def testClipGradientOptimizer(self):
     with self.cached_session():
       optimizer = gd.GradientDescentOptimizer(3.0)
-      values = [1, 5, 10]
-      vars_ = [variables.Variable([v], dtype=dtypes.float32) for v in values]
+      var = variables.Variable([1.0, 5.0, 10.0], dtype=dtypes.float32)
       map_optimizer = map_gradient_optimizer.MapGradientOptimizer(
           optimizer, map_fn_clipping_7_and_14)
       grads_and_vars = map_optimizer.compute_gradients(
-          vars_[0] * vars_[1] + vars_[0] * vars_[2] + vars_[1] * vars_[2],
-          vars_)
+          var[0] * var[1] + var[0] * var[2] + var[1] * var[2], [var])
       variables.global_variables_initializer().run()
-      expect_grads = ([14], [11], [7])
-      index = 0
-      for grad, _ in grads_and_vars:
-        self.assertAllCloseAccordingToType(expect_grads[index],
-                                           self.evaluate(grad))
-        index += 1
+      expect_grads = np.array([14., 11., 7.], dtype=np.float32)
+      grad, _ = grads_and_vars[0]
+      self.assertAllCloseAccordingToType(expect_grads, self.evaluate(grad))
 
   @test_util.deprecated_graph_mode_only
   def testWeightDecay(self):
     with self.cached_session():
       optimizer = gd.GradientDescentOptimizer(3.0)
-      values = [1, 5, 10]
-      vars_ = [variables.Variable([v], dtype=dtypes.float32) for v in values]
+      var = variables.Variable([1.0, 5.0, 10.0], dtype=dtypes.float32)
       map_optimizer = map_gradient_optimizer.MapGradientOptimizer(
           optimizer, map_fn_decay)
       grads_and_vars = map_optimizer.compute_gradients(
-          vars_[0] * vars_[1] + vars_[0] * vars_[2] + vars_[1] * vars_[2],
-          vars_)
+          var[0] * var[1] + var[0] * var[2] + var[1] * var[2], [var])
       variables.global_variables_initializer().run()
-      expect_grads = ([15.01], [11.05], [6.1])
-      index = 0
-      for grad, _ in grads_and_vars:
-        self.assertAllCloseAccordingToType(expect_grads[index],
-                                           self.evaluate(grad))
-        index += 1
+      expect_grads = np.array([15.01, 11.05, 6.1], dtype=np.float32)
+      grad, _ = grads_and_vars[0]
+      self.assertAllCloseAccordingToType(expect_grads, self.evaluate(grad))
 
   @test_util.deprecated_graph_mode_only
   def testMinimize(self):
     with self.cached_session():
-      values = [1, 2, 3]
-      vars_ = [variables.Variable([v], dtype=dtypes.float32) for v in values]
+      var = variables.Variable([1.0, 2.0, 3.0], dtype=dtypes.float32)
 
       optimizer = gd.GradientDescentOptimizer(1.0)
       map_optimizer = map_gradient_optimizer.MapGradientOptimizer(
           optimizer, map_fn_quadratic)
-      loss = math_ops.reduce_prod(vars_)
-      train_op = map_optimizer.minimize(loss, var_list=vars_)
+      loss = math_ops.reduce_prod(var)
+      train_op = map_optimizer.minimize(loss, var_list=[var])
       variables.global_variables_initializer().run()
       train_op.run()
 
@@ -188,10 +168,8 @@ class MapGradientOptimizerTest(test_util.TensorFlowTestCase):
       # Which is then squared with the MapOptimizer = 36, 9, 4
       # Grads then applied to the weights via GD w/ learning rate of 1.
       # = -35, -7, -1
-      expect_weights = ([-35.0], [-7.0], [-1.0])
-      for expected_weight, actual_weight_tensor in zip(expect_weights, vars_):
-        self.assertAllCloseAccordingToType(expected_weight,
-                                           self.evaluate(actual_weight_tensor))
+      expect_weights = np.array([-35.0, -7.0, -1.0], dtype=np.float32)
+      self.assertAllCloseAccordingToType(expect_weights, self.evaluate(var))
 
 
 if __name__ == "__main__":